@@ -0,0 +1,33 @@
+"""
+Alert levels, default thresholds and status messages.
+
+Kept free of metrics so the API and the load generator can use them without
+registering the pipeline's alerts_* series (see alerts.py for the engine).
+"""
+
+OPTIMAL, WARNING, CRITICAL = "OPTIMAL", "WARNING", "CRITICAL"
+LEVELS = {OPTIMAL: 0, WARNING: 1, CRITICAL: 2}
+
+# warning/critical: risk must exceed these to enter the level
+# hysteresis: risk must fall this far below a threshold to leave the level
+# debounce: consecutive windows the new level must hold before it is reported
+DEFAULTS = {"warning": 0.4, "critical": 0.8, "hysteresis": 0.05, "debounce": 2}
+
+
+def classify(risk, thresholds=DEFAULTS):
+    """Plain threshold level for a risk score, without hysteresis."""
+    if risk > thresholds["critical"]:
+        return CRITICAL
+    elif risk > thresholds["warning"]:
+        return WARNING
+    return OPTIMAL
+
+
+def status_message(risk, thresholds=DEFAULTS, level=None):
+    """Human-readable status; pass `level` to report the engine's state instead of the plain threshold."""
+    level = level or classify(risk, thresholds)
+    if level == CRITICAL:
+        return f"🔴 CRITICAL: Risk {risk:.2f}!"
+    elif level == WARNING:
+        return f"⚠️ WARNING: Risk {risk:.2f}."
+    return f"✅ OPTIMAL (Risk {risk:.2f})."
@@ -0,0 +1,347 @@
+"""
+Edge-side alert engine for the Pathway pipeline.
+
+AlertEngine turns the per-window failure_risk stream into alert state
+transitions (OPTIMAL / WARNING / CRITICAL). Thresholds can be set per
+machine, and hysteresis and debounce keep a machine sitting on a threshold
+from flapping. Each update touches only that machine's state, so cost
+scales with the machines that changed, not with fleet size.
+
+AlertNotifier fans transitions out to the `alerts` collection and an
+optional webhook. It deduplicates re-delivered windows and rate-limits
+notifications per machine and globally; a transition held back by the
+limits is sent once they allow it, unless the machine is back where the
+push channel last saw it.
+
+Thresholds come from a JSON file named by ALERT_CONFIG:
+
+    {"default": {"warning": 0.4, "critical": 0.8, "hysteresis": 0.05, "debounce": 2},
+     "machines": {"M07": {"critical": 0.7}}}
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from datetime import datetime
+
+# The pipeline keeps using alerts.status_message
+from alert_levels import CRITICAL, DEFAULTS, LEVELS, OPTIMAL, WARNING, status_message
+from telemetry import Counter, Gauge
+
+log = logging.getLogger("alerts")
+
+EVALUATIONS = Counter("alerts_evaluations_total", "Window updates evaluated by the alert engine")
+TRANSITIONS = Counter("alerts_transitions_total", "Alert state transitions", ["to"])
+NOTIFICATIONS = Counter("alerts_notifications_total", "Alert fan-out outcomes", ["outcome"])
+ACTIVE = Gauge("alerts_active_machines", "Machines currently in WARNING or CRITICAL")
+QUEUE_DEPTH = Gauge("alerts_queue_depth", "Transitions waiting: held back by the rate limits, or for the webhook", ["queue"])
+
+
+class AlertConfig:
+    """Default thresholds plus per-machine overrides."""
+
+    def __init__(self, default=None, machines=None):
+        self.default = {**DEFAULTS, **(default or {})}
+        self.machines = {m: {**self.default, **overrides} for m, overrides in (machines or {}).items()}
+
+    def for_machine(self, machine_id):
+        return self.machines.get(machine_id, self.default)
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("ALERT_CONFIG")
+        if not path:
+            return cls()
+        with open(path) as f:
+            raw = json.load(f)
+        log.info("event=alert_config_loaded path=%s overrides=%d", path, len(raw.get("machines", {})))
+        return cls(raw.get("default"), raw.get("machines"))
+
+
+class _MachineState:
+    __slots__ = ("state", "candidate", "count", "window", "seq_window", "seq")
+
+    def __init__(self, state=OPTIMAL):
+        self.state = state
+        self.candidate = None
+        self.count = 0
+        self.window = None
+        # Transitions already reported in seq_window, so alert_ids stay unique within a window
+        self.seq_window = None
+        self.seq = 0
+
+
+class AlertEngine:
+    """Incremental per-machine alert state machine."""
+
+    def __init__(self, config=None):
+        self.config = config or AlertConfig()
+        self._machines = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def restore(self, states):
+        """Seed states (machine_id -> level), e.g. from the alerts collection after a restart."""
+        with self._lock:
+            for machine_id, level in states.items():
+                if level in LEVELS:
+                    self._machines[machine_id] = _MachineState(level)
+            self._active = sum(1 for s in self._machines.values() if s.state != OPTIMAL)
+        ACTIVE.set(self._active)
+
+    def state(self, machine_id):
+        st = self._machines.get(machine_id)
+        return st.state if st else OPTIMAL
+
+    def _target(self, current, risk, t):
+        # Levels at or below the current one need the risk to clear the
+        # threshold by the hysteresis margin before we step down past them.
+        level = LEVELS[current]
+        critical = t["critical"] - t["hysteresis"] if level >= 2 else t["critical"]
+        warning = t["warning"] - t["hysteresis"] if level >= 1 else t["warning"]
+        if risk > critical:
+            return CRITICAL
+        elif risk > warning:
+            return WARNING
+        return OPTIMAL
+
+    def evaluate(self, machine_id, risk, window):
+        """
+        Feed one scored window. `window` identifies the window (its start time)
+        so updates to the same window don't count twice toward the debounce,
+        and late updates to an older window are ignored.
+        Returns a transition dict, or None if the reported state is unchanged.
+        """
+        EVALUATIONS.inc()
+        t = self.config.for_machine(machine_id)
+        with self._lock:
+            st = self._machines.get(machine_id)
+            if st is None:
+                st = self._machines[machine_id] = _MachineState()
+            if st.window is not None and window < st.window:
+                # Concurrent posts to the connector can close windows out of order
+                return None
+
+            target = self._target(st.state, risk, t)
+            if target == st.state:
+                st.candidate, st.count, st.window = None, 0, window
+                return None
+            if target != st.candidate:
+                st.candidate, st.count = target, 1
+            elif window > st.window:
+                st.count += 1
+            st.window = window
+            if st.count < t["debounce"]:
+                return None
+
+            previous, st.state = st.state, target
+            st.candidate, st.count = None, 0
+            if window != st.seq_window:
+                st.seq_window, st.seq = window, 0
+            seq, st.seq = st.seq, st.seq + 1
+            self._active += (target != OPTIMAL) - (previous != OPTIMAL)
+            active = self._active
+
+        ACTIVE.set(active)
+        TRANSITIONS.labels(target).inc()
+        # With debounce 1 a machine can leave and re-enter a level within one
+        # window; seq tells those apart, and `from` keeps ids distinct after a
+        # restart resets seq.
+        return {
+            "alert_id": f"{machine_id}:{window}:{seq}:{previous}-{target}",
+            "machine_id": machine_id,
+            "from": previous,
+            "to": target,
+            "risk": risk,
+            "window": window,
+            "timestamp": datetime.now().isoformat(),
+            "message": status_message(risk, t, target),
+        }
+
+
+class AlertNotifier:
+    """
+    Deduplicating, rate-limited fan-out for alert transitions.
+
+    Every new transition is recorded in the alerts collection. Only those
+    that pass the rate limits are pushed, to the webhook and to /alerts/stream
+    via notified=True and pushed_at. Escalations to CRITICAL skip the
+    per-machine interval but still count against the global budget.
+
+    The latest held-back transition per machine is kept and pushed by
+    flush() once the limits allow it, so the push channel never stays on a
+    state the engine has left. If the machine has meanwhile returned to the
+    state last pushed, it is dropped instead ("collapsed").
+    """
+
+    def __init__(self, collection=None, webhook_url=None, max_per_sec=20.0, burst=100,
+                 machine_interval_s=60.0, dedup_size=100000, queue_size=10000, flush_interval_s=1.0):
+        self.collection = collection
+        self.webhook_url = webhook_url
+        self.rate = max_per_sec
+        self.burst = burst
+        self.machine_interval_s = machine_interval_s
+        self.dedup_size = dedup_size
+        self._tokens = float(burst)
+        self._refilled = None
+        self._last_notified = {}
+        # State the push channel last showed per machine, and the newest transition held back
+        self._pushed_state = {}
+        self._pending = {}
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = None
+        if webhook_url:
+            self._queue = queue.Queue(maxsize=queue_size)
+            threading.Thread(target=self._webhook_worker, name="alert-webhook", daemon=True).start()
+        if flush_interval_s > 0:
+            threading.Thread(target=self._flush_loop, args=(flush_interval_s,), name="alert-flush", daemon=True).start()
+
+    @classmethod
+    def from_env(cls, collection=None):
+        return cls(
+            collection,
+            webhook_url=os.getenv("ALERT_WEBHOOK_URL") or None,
+            max_per_sec=float(os.getenv("ALERT_MAX_PER_SEC", "20")),
+            burst=int(os.getenv("ALERT_BURST", "100")),
+            machine_interval_s=float(os.getenv("ALERT_MACHINE_INTERVAL_S", "60")),
+        )
+
+    def _is_duplicate(self, alert_id):
+        if alert_id in self._seen:
+            return True
+        self._seen[alert_id] = None
+        if len(self._seen) > self.dedup_size:
+            self._seen.popitem(last=False)
+        return False
+
+    def _allow(self, transition, now):
+        machine_id = transition["machine_id"]
+        last = self._last_notified.get(machine_id)
+        if transition["to"] != CRITICAL and last is not None and now - last < self.machine_interval_s:
+            return False
+        if self._refilled is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        self._last_notified[machine_id] = now
+        self._pushed_state[machine_id] = transition["to"]
+        return True
+
+    def publish(self, transition, now=None):
+        """Record and (rate limits permitting) push one transition. Returns True if pushed."""
+        now = time.monotonic() if now is None else now
+        machine_id = transition["machine_id"]
+        with self._lock:
+            # Whatever was held back for this machine is superseded by this
+            # transition, even a re-delivered one: it is the engine's newest state.
+            self._pending.pop(machine_id, None)
+            if self._is_duplicate(transition["alert_id"]):
+                outcome = "deduped"
+            elif transition["to"] == self._pushed_state.setdefault(machine_id, transition["from"]):
+                outcome = "collapsed"
+            elif self._allow(transition, now):
+                outcome = "sent"
+            else:
+                outcome = "rate_limited"
+                self._pending[machine_id] = transition
+            QUEUE_DEPTH.labels("pending").set(len(self._pending))
+
+        if outcome == "deduped":
+            NOTIFICATIONS.labels(outcome).inc()
+            return False
+
+        notified = outcome == "sent"
+        doc = dict(transition, notified=notified, pushed_at=time.time() if notified else None)
+        if self.collection is not None:
+            try:
+                # Upsert on alert_id so a pipeline restart replaying a window can't double-insert
+                self.collection.update_one({"alert_id": doc["alert_id"]}, {"$setOnInsert": doc}, upsert=True)
+            except Exception as e:
+                log.error("event=alert_write_failed alert_id=%s error=%r", doc["alert_id"], e)
+
+        if not notified:
+            NOTIFICATIONS.labels(outcome).inc()
+            return False
+        return self._push(transition)
+
+    def flush(self, now=None):
+        """Push held-back transitions the rate limits now allow. Returns how many were pushed."""
+        now = time.monotonic() if now is None else now
+        ready = []
+        with self._lock:
+            for machine_id, transition in list(self._pending.items()):
+                if transition["to"] == self._pushed_state.get(machine_id):
+                    del self._pending[machine_id]
+                    NOTIFICATIONS.labels("collapsed").inc()
+                elif self._allow(transition, now):
+                    del self._pending[machine_id]
+                    ready.append(transition)
+            QUEUE_DEPTH.labels("pending").set(len(self._pending))
+
+        for transition in ready:
+            if self.collection is not None:
+                # Upsert the whole record: publish() writes it outside the lock,
+                # so this may run first. Its later $setOnInsert is then a no-op.
+                pushed = {"notified": True, "pushed_at": time.time()}
+                record = {k: v for k, v in transition.items() if k not in pushed}
+                try:
+                    self.collection.update_one(
+                        {"alert_id": transition["alert_id"]},
+                        {"$set": pushed, "$setOnInsert": record},
+                        upsert=True,
+                    )
+                except Exception as e:
+                    log.error("event=alert_write_failed alert_id=%s error=%r", transition["alert_id"], e)
+            self._push(transition)
+        return len(ready)
+
+    def _push(self, transition):
+        log.info("event=alert machine_id=%s from=%s to=%s risk=%.2f",
+                 transition["machine_id"], transition["from"], transition["to"], transition["risk"])
+        if self._queue is not None:
+            try:
+                self._queue.put_nowait(transition)
+            except queue.Full:
+                NOTIFICATIONS.labels("dropped").inc()
+                return False
+            finally:
+                QUEUE_DEPTH.labels("webhook").set(self._queue.qsize())
+        NOTIFICATIONS.labels("sent").inc()
+        return True
+
+    def _flush_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                log.error("event=alert_flush_failed error=%r", e)
+
+    def _webhook_worker(self):
+        while True:
+            transition = self._queue.get()
+            QUEUE_DEPTH.labels("webhook").set(self._queue.qsize())
+            body = json.dumps(transition).encode("utf-8")
+            req = urllib.request.Request(self.webhook_url, data=body, headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(req, timeout=5) as resp:
+                    resp.read()
+            except Exception as e:
+                NOTIFICATIONS.labels("failed").inc()
+                log.warning("event=alert_webhook_failed alert_id=%s error=%r", transition["alert_id"], e)
+
+
+def latest_states(collection):
+    """Last reported level per machine from the alerts collection, for AlertEngine.restore()."""
+    pipeline = [
+        {"$sort": {"_id": -1}},
+        {"$group": {"_id": "$machine_id", "to": {"$first": "$to"}}},
+    ]
+    return {doc["_id"]: doc["to"] for doc in collection.aggregate(pipeline)}
@@ -1,24 +1,39 @@
-from fastapi import FastAPI, Body
+from fastapi import FastAPI, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
-import google.generativeai as genai
+from fastapi.responses import Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 import os
 from pymongo import MongoClient
 from datetime import datetime
 from dotenv import load_dotenv
-import requests
 import json
 import time
-import math
-import random
-from pathway_llm import pathway_rag_service
+import asyncio
+import importlib
+import logging
+import threading
+import telemetry
+from telemetry import Histogram, Counter
+from load_generator import SensorSimulator, to_machine_doc
+import pathway_llm
+from pathway_llm import pathway_rag_service, record_gemini_usage, LLM_LATENCY, LLM_ERRORS
+
+# LLM SDKs (google.generativeai, requests, pathway xpack, litellm) are imported
+# on first use, not here, so a worker can serve /health without paying for them.
 
 load_dotenv()
+telemetry.configure_logging()
+
+log = logging.getLogger("api")
+
+REQUEST_LATENCY = Histogram("api_request_latency_seconds", "HTTP request latency by route", ["method", "route", "status"])
+MONGO_READ_LATENCY = Histogram("api_mongo_read_latency_seconds", "Mongo query latency in API handlers", ["collection"])
+SYNTHETIC_RESPONSES = Counter("api_synthetic_responses_total", "/machines responses served from synthetic data")
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-client = MongoClient(MONGO_URI)
-db = client["predictive_maintenance"]
-machines_col = db["machines"]
-insights_col = db["insights"]
+# Set by the lifespan hook: MongoClient is not fork-safe, so each worker builds its own
+client = db = machines_col = insights_col = alerts_col = None
 
 api_key = os.getenv("GOOGLE_API_KEY")
 
@@ -27,6 +42,7 @@ class DirectGeminiModel:
         self.api_key = api_key
 
     def generate_content(self, prompt):
+        import requests
         models = ["gemini-2.0-flash", "gemini-1.5-flash"]
         last_error = None
         class ResponseWrapper:
@@ -36,22 +52,28 @@ class DirectGeminiModel:
             url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={self.api_key}"
             for attempt in range(3):
                 try:
-                    response = requests.post(
-                        url, 
-                        headers={'Content-Type': 'application/json'}, 
-                        json={"contents": [{"parts": [{"text": prompt}]}]}
-                    )
+                    with LLM_LATENCY.labels("gemini").time():
+                        response = requests.post(
+                            url, 
+                            headers={'Content-Type': 'application/json'}, 
+                            json={"contents": [{"parts": [{"text": prompt}]}]}
+                        )
                     if response.status_code == 200:
                         try:
-                            return ResponseWrapper(response.json()['candidates'][0]['content']['parts'][0]['text'])
+                            body = response.json()
+                            record_gemini_usage(body)
+                            return ResponseWrapper(body['candidates'][0]['content']['parts'][0]['text'])
                         except: return ResponseWrapper("Error parsing AI response.")
                     elif response.status_code == 429:
+                        LLM_ERRORS.labels("gemini").inc()
                         time.sleep(2**attempt)
                         continue
                     else:
+                        LLM_ERRORS.labels("gemini").inc()
                         last_error = f"AI Error ({response.status_code})"
                         break
                 except Exception as e:
+                    LLM_ERRORS.labels("gemini").inc()
                     last_error = str(e)
                     break
         return ResponseWrapper(last_error or "AI unavailable.")
@@ -61,58 +83,82 @@ class MockModel:
         class Mock: text = "AI unavailable. Check API Key."
         return Mock()
 
-if not api_key:
-    print("Warning: GOOGLE_API_KEY not found.")
-    model = MockModel()
-else:
+_model = None
+_model_lock = threading.Lock()
+
+def _build_model():
+    if not api_key:
+        log.warning("event=missing_api_key key=GOOGLE_API_KEY")
+        return MockModel()
     try:
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-pro")
+        return genai.GenerativeModel("gemini-pro")
     except:
-        model = DirectGeminiModel(api_key)
+        return DirectGeminiModel(api_key)
 
-if not model: model = MockModel()
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = _build_model() or MockModel()
+    return _model
 
-app = FastAPI()
+def preload():
+    """Import every LLM dependency now. Used by the pre-fork master (gunicorn.conf.py)."""
+    get_model()
+    importlib.import_module("requests")  # used lazily by DirectGeminiModel
+    pathway_llm.preload()
+
+@asynccontextmanager
+async def lifespan(app):
+    global client, db, machines_col, insights_col, alerts_col
+    client = MongoClient(MONGO_URI)
+    db = client["predictive_maintenance"]
+    machines_col = db["machines"]
+    insights_col = db["insights"]
+    alerts_col = db["alerts"]
+    # No-op unless METRICS_MULTIPROC_DIR is set (gunicorn.conf.py)
+    telemetry.start_multiprocess_writer()
+    yield
+    client.close()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
-_synthetic_t = 0
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(request.method, route.path if route else "unmatched", status).observe(time.perf_counter() - start)
+
+_synthetic = SensorSimulator(machines=1, seed=None, anomaly_rate=0.02)
 
 def _gen_synthetic():
-    global _synthetic_t
-    _synthetic_t += 1
-    t = _synthetic_t
-    temp = 68 + 12 * math.sin(t / 15) + (random.random() - 0.5) * 4
-    vib  = 0.35 + 0.18 * abs(math.sin(t / 8)) + (random.random() - 0.5) * 0.06
-    hum  = 44 + 8 * math.cos(t / 20) + (random.random() - 0.5) * 2
-    rssi = -58 + random.randint(-5, 5)
-    risk = min(0.95, max(0.02, (temp - 60) / 60 + vib / 1.5 - 0.1 + (random.random() - 0.5) * 0.05))
-    if risk > 0.8:
-        msg = f"🔴 CRITICAL: Risk {risk*100:.0f}%!"
-    elif risk > 0.4:
-        msg = f"⚠️ WARNING: Risk {risk*100:.0f}%."
-    else:
-        msg = f"✅ OPTIMAL (Risk {risk*100:.0f}%)."
-    return {
-        "machine_id": "M01",
-        "temperature": round(temp, 1),
-        "avg_temp": round(temp, 1),
-        "vibration": round(vib, 3),
-        "avg_vibration": round(vib, 3),
-        "humidity": round(hum, 1),
-        "avg_humidity": round(hum, 1),
-        "signal_strength": rssi,
-        "avg_rssi": rssi,
-        "failure_risk": round(risk, 3),
-        "timestamp": datetime.now().isoformat(),
-        "source": "SYNTHETIC",
-        "message": msg
-    }
+    return to_machine_doc(_synthetic.next_packet(), source="SYNTHETIC")
+
+def generate_content(prompt):
+    # DirectGeminiModel records its own latency and tokens; the SDK path only latency
+    model = get_model()
+    if isinstance(model, (DirectGeminiModel, MockModel)):
+        return model.generate_content(prompt).text
+    with LLM_LATENCY.labels("genai").time():
+        return model.generate_content(prompt).text
 
 def get_machine_context():
+    with MONGO_READ_LATENCY.labels("machines").time():
+        machines = list(machines_col.find({}, {"_id": 0}))
     return "Current Status:\n" + "\n".join([
         f"Machine {m['machine_id']}: Temp {m['avg_temp']}C, Vib {m['avg_vibration']}g, Risk {m['failure_risk']*100}%, Status: {m['message']}"
-        for m in list(machines_col.find({}, {"_id": 0}))
+        for m in machines
     ])
 
 @app.get("/")
@@ -121,34 +167,37 @@ def root(): return {"status": "API running"}
 @app.get("/health")
 def health(): return {"status": "ok", "timestamp": datetime.now().isoformat()}
 
+@app.get("/metrics")
+def metrics(): return Response(telemetry.render(), media_type=telemetry.CONTENT_TYPE)
+
 @app.get("/machines")
 def get_machines():
-    data = list(machines_col.find({"machine_id": "M01"}, {"_id": 0}))
-    print(f"📡 [API] /machines called. Returning {len(data)} records (M01 Only).")
+    with MONGO_READ_LATENCY.labels("machines").time():
+        data = list(machines_col.find({"machine_id": "M01"}, {"_id": 0}))
+    log.debug("event=machines_read records=%d", len(data))
     if not data:
         # Hardware not connected — return synthetic demo data
-        print("🧩 [API] No real data found. Returning synthetic demo record.")
+        SYNTHETIC_RESPONSES.inc()
         return [_gen_synthetic()]
     return data
 
 @app.post("/explain")
 def explain(alert: dict = Body(...)):
-    print(f"📡 [API] /explain called for alert: {alert.get('id')}")
+    log.debug("event=explain alert_id=%s", alert.get('id'))
     try:
-        if isinstance(model, MockModel):
+        if isinstance(get_model(), MockModel):
             # Fallback to Pathway/Groq
             context = get_machine_context()
             prompt = f"Explain this alert in the context of the current system: {alert}"
             answer = pathway_rag_service.answer(prompt, context)
             return {"explanation": answer}
-        return {"explanation": model.generate_content(f"Explain alert: {alert}").text}
+        return {"explanation": generate_content(f"Explain alert: {alert}")}
     except Exception as e: 
-        print(f"❌ [API] explain failed: {e}")
+        log.error("event=explain_failed error=%r", e)
         return {"explanation": str(e)}
 
 @app.post("/insights/generate")
 def generate_insights():
-    print("📡 [API] /insights/generate called")
     try:
         context = get_machine_context()
         analysis = pathway_rag_service.generate_insights(context)
@@ -161,42 +210,41 @@ def generate_insights():
         insight.pop("_id", None)
         return {"success": True, "insight": insight}
     except Exception as e: 
-        print(f"❌ [API] generate_insights failed: {e}")
+        log.error("event=generate_insights_failed error=%r", e)
         return {"success": False, "error": str(e)}
 
 @app.get("/insights/latest")
 def get_latest_insight():
-    print("📡 [API] /insights/latest called")
-    insight = insights_col.find_one({}, {"_id": 0}, sort=[("timestamp", -1)])
+    with MONGO_READ_LATENCY.labels("insights").time():
+        insight = insights_col.find_one({}, {"_id": 0}, sort=[("timestamp", -1)])
     if insight: insight.pop("_id", None)
     return {"success": True, "insight": insight} if insight else {"success": False, "message": "No insights"}
 
 @app.post("/insights/rag")
 def rag_query(query: dict = Body(...)):
-    print(f"📡 [API] /insights/rag called with question: {query.get('question')}")
+    log.debug("event=rag_query question=%r", query.get('question'))
     try:
         context = get_machine_context()
-        recent = list(insights_col.find({}, {"_id": 0, "analysis": 1}).sort("timestamp", -1).limit(3))
+        with MONGO_READ_LATENCY.labels("insights").time():
+            recent = list(insights_col.find({}, {"_id": 0, "analysis": 1}).sort("timestamp", -1).limit(3))
         history = "\n".join([r['analysis'][:200] for r in recent])
         answer = pathway_rag_service.answer(query.get("question", ""), context, history)
-        print("✅ [API] RAG answer generated.")
         return {
             "success": True, 
             "answer": answer
         }
     except Exception as e: 
-        print(f"❌ [API] rag_query failed: {e}")
+        log.error("event=rag_query_failed error=%r", e)
         return {"success": False, "error": str(e)}
 
 @app.post("/report/generate")
 def generate_report():
-    print("📡 [API] /report/generate called")
     try:
         context = get_machine_context()
-        if isinstance(model, MockModel):
+        if isinstance(get_model(), MockModel):
             content = pathway_rag_service.answer("Generate a detailed maintenance report for these machines.", context)
         else:
-            content = model.generate_content(f"Generate maintenance report for: {context}").text
+            content = generate_content(f"Generate maintenance report for: {context}")
             
         report = {
             "timestamp": datetime.now().isoformat(),
@@ -207,11 +255,44 @@ def generate_report():
         report.pop("_id", None)
         return {"success": True, "report": report}
     except Exception as e: 
-        print(f"❌ [API] generate_report failed: {e}")
+        log.error("event=generate_report_failed error=%r", e)
         return {"success": False, "error": str(e)}
 
 @app.get("/report/latest")
 def get_latest_report():
     report = db["reports"].find_one({}, {"_id": 0}, sort=[("timestamp", -1)])
     if report: report.pop("_id", None)
-    return {"success": True, "report": report} if report else {"success": False, "message": "No reports"}
\ No newline at end of file
+    return {"success": True, "report": report} if report else {"success": False, "message": "No reports"}
+
+@app.get("/alerts")
+def get_alerts(limit: int = 50, machine_id: str = None):
+    query = {"machine_id": machine_id} if machine_id else {}
+    with MONGO_READ_LATENCY.labels("alerts").time():
+        recent = list(alerts_col.find(query, {"_id": 0}).sort("_id", -1).limit(max(1, min(limit, 500))))
+    return {"success": True, "alerts": recent}
+
+def _alerts_after(last_pushed):
+    # pushed_at, not _id: a transition held back by the rate limits is pushed later
+    query = {"pushed_at": {"$gt": last_pushed}}
+    return list(alerts_col.find(query, {"_id": 0}).sort("pushed_at", 1).limit(100))
+
+@app.get("/alerts/stream")
+async def stream_alerts():
+    """Server-sent events: pushes each notified alert transition as the pipeline records it."""
+    async def events():
+        latest = await run_in_threadpool(
+            lambda: alerts_col.find_one({"pushed_at": {"$ne": None}}, {"pushed_at": 1}, sort=[("pushed_at", -1)]))
+        last_pushed = latest["pushed_at"] if latest else 0.0
+        idle = 0
+        while True:
+            docs = await run_in_threadpool(_alerts_after, last_pushed)
+            for doc in docs:
+                last_pushed = doc["pushed_at"]
+                yield f"event: alert\ndata: {json.dumps(doc)}\n\n"
+            idle = 0 if docs else idle + 1
+            if idle >= 15:
+                idle = 0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(1)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,117 @@
+"""
+Alert engine benchmark: 50k machines, 1% of the fleet changing state per minute.
+
+Replays simulated 5s windows through AlertEngine + AlertNotifier two ways:
+
+  incremental  evaluate only machines with a new window in the tick (what the
+               pipeline's subscribe callback does)
+  full_scan    re-evaluate every machine each tick, like polling the machines
+               collection would
+
+and reports per-tick p50/p99, evaluations/sec and transitions emitted.
+
+    python -m bench.alert_engine [--machines 50000] [--minutes 5] [--out bench/results/alert_engine.json]
+"""
+import argparse
+import random
+import sys
+import time
+
+import alerts
+from bench.common import run_metadata, summarize, write_results
+from load_generator import machine_ids
+
+WINDOW_S = 5
+WINDOWS_PER_MINUTE = 60 // WINDOW_S
+CALM, HOT = 0.2, 0.9
+
+
+def build_ticks(args):
+    """Pre-generate every tick's (machine_id, risk, window) updates so timing covers only the engine."""
+    rng = random.Random(args.seed)
+    ids = machine_ids(args.machines)
+    risk = {m: CALM for m in ids}
+    flipping = max(1, int(args.machines * args.transition_rate))
+    reporters = max(0, int(args.machines * args.report_fraction))
+    noise = [rng.uniform(-0.05, 0.05) for _ in range(4096)]
+
+    ticks = []
+    for minute in range(args.minutes):
+        changed = set(rng.sample(ids, flipping))
+        for m in changed:
+            risk[m] = CALM if risk[m] == HOT else HOT
+        for w in range(WINDOWS_PER_MINUTE):
+            window = (minute * WINDOWS_PER_MINUTE + w) * WINDOW_S
+            batch = set(rng.sample(ids, reporters)) | changed
+            ticks.append([(m, risk[m] + noise[i % 4096], window) for i, m in enumerate(batch)])
+    return ticks, ids
+
+
+def run(ticks, fleet, full_scan, args):
+    engine = alerts.AlertEngine()
+    notifier = alerts.AlertNotifier(max_per_sec=args.max_per_sec, burst=args.burst, machine_interval_s=60,
+                                     flush_interval_s=0)
+    last_risk = {m: CALM for m in fleet}
+    latencies, evaluations, transitions, pushed = [], 0, 0, 0
+
+    start = time.perf_counter()
+    for batch in ticks:
+        t0 = time.perf_counter()
+        if full_scan:
+            for m, r, _ in batch:
+                last_risk[m] = r
+            window = batch[0][2] if batch else 0
+            batch = [(m, last_risk[m], window) for m in fleet]
+        for m, r, window in batch:
+            transition = engine.evaluate(m, r, window)
+            if transition is not None:
+                transitions += 1
+                pushed += notifier.publish(transition)
+        evaluations += len(batch)
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+
+    result = summarize(latencies, wall)
+    result.update(
+        ticks=result["count"],
+        count=evaluations,
+        throughput_per_s=round(evaluations / wall, 2),
+        evaluations_per_tick=round(evaluations / max(1, len(ticks)), 1),
+        transitions=transitions,
+        notifications=pushed,
+    )
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--machines", type=int, default=50000)
+    parser.add_argument("--minutes", type=int, default=5)
+    parser.add_argument("--transition-rate", type=float, default=0.01, help="fraction of the fleet changing state per minute")
+    parser.add_argument("--report-fraction", type=float, default=0.01,
+                        help="fraction of the fleet with a new (non-transitioning) window each tick")
+    parser.add_argument("--max-per-sec", type=float, default=1e9, help="notifier global rate (default: unthrottled)")
+    parser.add_argument("--burst", type=int, default=10**9)
+    parser.add_argument("--skip-full-scan", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args(argv)
+
+    ticks, fleet = build_ticks(args)
+    stages = {"incremental": run(ticks, fleet, False, args)}
+    if not args.skip_full_scan:
+        stages["full_scan"] = run(ticks, fleet, True, args)
+
+    expected = int(args.machines * args.transition_rate) * args.minutes
+    print(f"{args.machines} machines, {args.minutes} min, {len(ticks)} ticks, ~{expected} transitions expected")
+    print(f"{'mode':<12} {'evals/tick':>11} {'evals/s':>12} {'p50 ms':>9} {'p99 ms':>9} {'transitions':>12}")
+    for name, r in stages.items():
+        print(f"{name:<12} {r['evaluations_per_tick']:>11.0f} {r['throughput_per_s']:>12.0f} "
+              f"{r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['transitions']:>12}")
+
+    if args.out:
+        write_results(args.out, {"meta": run_metadata(args), "stages": stages})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
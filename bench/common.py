@@ -0,0 +1,117 @@
+"""Shared helpers for the bench suite: latency summaries, result files, metric scraping."""
+import json
+import math
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import urllib.request
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list, q in [0, 100]."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, wall_s, errors=0):
+    values = sorted(latencies)
+    ms = lambda v: None if v is None else round(v * 1000, 4)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "wall_s": round(wall_s, 4),
+        "throughput_per_s": round(len(values) / wall_s, 2) if wall_s > 0 else None,
+        "p50_ms": ms(percentile(values, 50)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1] if values else None),
+    }
+
+
+def free_port():
+    """An unused localhost TCP port for a subprocess under test."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def skipped(reason):
+    return {"skipped": reason}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_metadata(args):
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "git_rev": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k != "out"},
+    }
+
+
+def write_results(path, results):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+_BUCKET_RE = re.compile(r'^(\w+)_bucket\{(.*)\} (\S+)$')
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def scrape_histogram(url, name, timeout=2):
+    """Fetch a /metrics page and return {labels-without-le: [(le, cumulative_count), ...]}."""
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        text = resp.read().decode("utf-8")
+    series = {}
+    for line in text.splitlines():
+        m = _BUCKET_RE.match(line)
+        if not m or m.group(1) != name:
+            continue
+        labels = dict(_LABEL_RE.findall(m.group(2)))
+        le = labels.pop("le")
+        key = tuple(sorted(labels.items()))
+        series.setdefault(key, []).append((float(le), float(m.group(3))))
+    return series
+
+
+def histogram_quantile(q, buckets):
+    """Upper-bound estimate of quantile q (0-1) from cumulative (le, count) buckets."""
+    buckets = sorted(buckets)
+    total = buckets[-1][1] if buckets else 0
+    if total <= 0:
+        return None
+    target = q * total
+    for le, count in buckets:
+        if count >= target:
+            return le
+    return buckets[-1][0]
+
+
+def diff_histograms(before, after):
+    """Per-series bucket deltas so a scrape pair covers only the benchmark run."""
+    out = {}
+    for key, buckets in after.items():
+        prev = dict(before.get(key, []))
+        out[key] = [(le, count - prev.get(le, 0.0)) for le, count in buckets]
+    return out
+
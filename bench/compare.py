@@ -0,0 +1,55 @@
+"""
+Compare two bench result files and flag regressions.
+
+A stage regresses when throughput drops, or p50/p99 latency grows, by more
+than the tolerance. Exits 1 if any stage regressed.
+
+    python -m bench.compare bench/results/baseline.json bench/results/current.json --tolerance 0.1
+"""
+import argparse
+import sys
+
+from bench.common import load_results
+
+# metric -> True when bigger is better
+METRICS = {"throughput_per_s": True, "p50_ms": False, "p99_ms": False}
+
+
+def compare(baseline, current, tolerance):
+    """Yield (stage, metric, old, new, change, regressed) for every comparable metric."""
+    for stage, new in current["stages"].items():
+        old = baseline["stages"].get(stage)
+        if old is None or "skipped" in old or "skipped" in new:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            a, b = old.get(metric), new.get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            yield stage, metric, a, b, change, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative change (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    if baseline["meta"].get("params") != current["meta"].get("params"):
+        print("warning: runs used different parameters; comparison may be meaningless", file=sys.stderr)
+
+    regressions = 0
+    print(f"{'stage':<10} {'metric':<17} {'baseline':>12} {'current':>12} {'change':>9}")
+    for stage, metric, a, b, change, regressed in compare(baseline, current, args.tolerance):
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{stage:<10} {metric:<17} {a:>12.3f} {b:>12.3f} {change * 100:>+8.1f}%{flag}")
+    print(f"{regressions} regression(s) at ±{args.tolerance * 100:.0f}% tolerance")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Cold-start benchmark for the API.
+
+Measures `import api` with `python -X importtime` and the wall time from
+spawning uvicorn to the first 200 from /health, and checks both against a
+budget. Also fails if an LLM SDK that should be lazy is imported eagerly.
+
+    python -m bench.import_time [--runs 5] [--import-budget-ms 750] [--health-budget-s 2.0]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from bench.common import ROOT, free_port, percentile, run_metadata, write_results
+
+# Must not be imported until an LLM route is hit
+LAZY_MODULES = ("google.generativeai", "pathway", "pathway.xpacks.llm", "litellm", "groq", "requests")
+
+
+def import_profile():
+    """Return ({module: (self_us, cumulative_us, depth)}, cumulative_us of `api`)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"`import api` failed:\n{proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules, modules["api"][1]
+
+
+def time_to_health(timeout):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited early:\n{proc.stderr.read().decode()[-2000:]}")
+            try:
+                with urllib.request.urlopen(url, timeout=0.5) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError(f"/health not serving after {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=750.0)
+    parser.add_argument("--health-budget-s", type=float, default=2.0)
+    parser.add_argument("--top", type=int, default=10, help="heaviest top-level imports to list")
+    parser.add_argument("--out", default=None, help="optional JSON results, comparable with bench.compare")
+    args = parser.parse_args(argv)
+
+    imports, health = [], []
+    for _ in range(args.runs):
+        modules, api_us = import_profile()
+        imports.append(api_us / 1000)
+        health.append(time_to_health(timeout=args.health_budget_s * 10))
+
+    eager = [m for m in LAZY_MODULES if m in modules]
+    heaviest = sorted(((cum, name) for name, (_, cum, depth) in modules.items() if depth <= 1 and name != "api"), reverse=True)
+
+    print("heaviest imports under `import api` (last run):")
+    for cum, name in heaviest[:args.top]:
+        print(f"  {cum / 1000:9.1f} ms  {name}")
+    import_ms = statistics.median(imports)
+    health_s = statistics.median(health)
+    print(f"import api:        median {import_ms:8.1f} ms   (budget {args.import_budget_ms:.0f} ms)")
+    print(f"/health serving:   median {health_s:8.3f} s    (budget {args.health_budget_s:.1f} s)")
+    if eager:
+        print(f"eagerly imported:  {', '.join(eager)}")
+
+    if args.out:
+        health_sorted = sorted(h * 1000 for h in health)
+        imports_sorted = sorted(imports)
+        write_results(args.out, {
+            "meta": run_metadata(args),
+            "stages": {
+                "import_api": {"count": args.runs, "errors": 0, "p50_ms": round(import_ms, 3), "p99_ms": round(percentile(imports_sorted, 99), 3)},
+                "health_ready": {"count": args.runs, "errors": 0, "p50_ms": round(health_s * 1000, 3), "p99_ms": round(percentile(health_sorted, 99), 3)},
+            },
+        })
+
+    ok = import_ms <= args.import_budget_ms and health_s <= args.health_budget_s and not eager
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Instrumentation overhead benchmark on the real pipeline.
+
+Starts pipeline.py as a subprocess with METRICS_ENABLED=0 and then =1
+(interleaved, --repeats times each) and drives the same seeded load through
+its HTTP connector. The CPU the pipeline process spends on that load is
+read from /proc before and after, so startup cost doesn't dilute the
+result. Fails if the instrumented run costs more than the budget.
+
+With metrics disabled the per-input-row subscribe callback is not
+registered and every observe/inc is a no-op, so the difference covers the
+whole surface: on_input, the stage-lag and scoring histograms, and the
+sink counters and Mongo latency timers.
+
+Needs pathway and a reachable MongoDB (the sink writes are part of the path).
+Linux only, because it reads /proc.
+
+    python -m bench.metrics_overhead [--rows 20000] [--rate 2000] [--repeats 3] [--budget 0.02]
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+
+from bench.common import ROOT, free_port
+from load_generator import LoadDriver, PipelineSink, SensorSimulator
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def cpu_seconds(pid):
+    """User + system CPU of a process, all threads included."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # fields[11], fields[12] are utime and stime (stat fields 14 and 15)
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def _wait_for_connector(sink, proc, timeout):
+    deadline = time.monotonic() + timeout
+    probe = SensorSimulator(1, seed=0).next_packet()
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"pipeline.py exited early with code {proc.returncode}")
+        try:
+            sink.send(probe)
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"pipeline connector not up after {timeout}s")
+
+
+def run_once(enabled, args):
+    port = free_port()
+    env = dict(
+        os.environ,
+        METRICS_ENABLED="1" if enabled else "0",
+        PIPELINE_PORT=str(port),
+        PIPELINE_METRICS_PORT=str(free_port()),
+        LOG_LEVEL="WARNING",
+    )
+    proc = subprocess.Popen([sys.executable, "pipeline.py"], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        sink = PipelineSink(f"http://127.0.0.1:{port}/", timeout=5)
+        _wait_for_connector(sink, proc, args.startup_timeout)
+        time.sleep(args.settle)  # let startup work finish before the CPU baseline
+
+        before = cpu_seconds(proc.pid)
+        sim = SensorSimulator(args.machines, args.seed)
+        driver = LoadDriver(sim, sink, args.rate, args.concurrency)
+        driver.run(count=args.rows)
+        time.sleep(args.settle)  # last windows close and reach the sink
+        used = cpu_seconds(proc.pid) - before
+        if driver.errors:
+            print(f"  warning: {driver.errors} sends failed (metrics={int(enabled)})", file=sys.stderr)
+        return used
+    finally:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--rate", type=float, default=2000.0)
+    parser.add_argument("--machines", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--settle", type=float, default=7.0)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--budget", type=float, default=0.02, help="max relative overhead (0.02 = 2%%)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    plain, instrumented = [], []
+    for i in range(args.repeats):
+        # Interleave so drift (thermal, other tenants) hits both sides equally
+        plain.append(run_once(False, args))
+        instrumented.append(run_once(True, args))
+        print(f"  run {i + 1}: off {plain[-1]:.2f}s cpu, on {instrumented[-1]:.2f}s cpu", file=sys.stderr)
+
+    base = statistics.median(plain)
+    inst = statistics.median(instrumented)
+    overhead = (inst - base) / base
+    print(f"rows/run:        {args.rows}")
+    print(f"metrics off:     {base / args.rows * 1e6:9.1f} us cpu/row")
+    print(f"metrics on:      {inst / args.rows * 1e6:9.1f} us cpu/row")
+    print(f"overhead:        {overhead * 100:+.2f}% (budget {args.budget * 100:.1f}%)")
+    return 0 if overhead <= args.budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""
+End-to-end benchmark suite driven by load_generator.
+
+Each stage reports throughput and p50/p99 latency; results are written as
+JSON so two runs can be diffed with `python -m bench.compare`.
+
+  generate  simulator + payload mapping, in-process
+  gateway   stub hardware /stream over loopback (stdlib client)
+  ingest    ingestion.fetch_real_data against the stub gateway (aiohttp)
+  score     ml_model.get_risk_score on generated readings
+  pipeline  open-loop POSTs to a running pipeline.py connector, plus stage
+            lag scraped from its /metrics exporter
+  mongo     open-loop upserts into a local MongoDB (separate bench database)
+
+Stages whose dependency or local service is missing are recorded as skipped.
+Nothing leaves localhost.
+
+    python -m bench.run --machines 50 --rate 200 --duration 10 --out bench/results/current.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from bench.common import (
+    diff_histograms, histogram_quantile, run_metadata, scrape_histogram,
+    skipped, summarize, write_results,
+)
+from load_generator import GatewayStub, LoadDriver, MongoSink, PipelineSink, SensorSimulator, to_pipeline_payload
+
+log = logging.getLogger("bench")
+
+STAGES = ("generate", "gateway", "ingest", "score", "pipeline", "mongo")
+BENCH_DATABASE = "predictive_maintenance_bench"
+
+
+def _simulator(args):
+    return SensorSimulator(args.machines, args.seed, args.anomaly_rate, args.fault_rate)
+
+
+def _filled_gateway(args):
+    sim = _simulator(args)
+    stub = GatewayStub(error_rate=args.fault_rate, seed=args.seed).start()
+    for _ in range(stub.packets.maxlen):
+        packet = sim.next_packet()
+        if packet is not None:
+            stub.send(packet)
+    return stub, sim
+
+
+def stage_generate(args):
+    sim = _simulator(args)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(args.count):
+        t0 = time.perf_counter()
+        packet = sim.next_packet()
+        if packet is not None:
+            to_pipeline_payload(packet)
+            latencies.append(time.perf_counter() - t0)
+    result = summarize(latencies, time.perf_counter() - start)
+    result.update(anomalies=sim.stats["anomalies"], faults=sim.stats["faults"])
+    return result
+
+
+def stage_gateway(args):
+    stub, sim = _filled_gateway(args)
+    latencies, errors = [], 0
+    try:
+        start = time.perf_counter()
+        for _ in range(args.polls):
+            packet = sim.next_packet()
+            if packet is not None:
+                stub.send(packet)
+            t0 = time.perf_counter()
+            try:
+                with urllib.request.urlopen(stub.url, timeout=4) as resp:
+                    json.loads(resp.read())
+                latencies.append(time.perf_counter() - t0)
+            except urllib.error.URLError:
+                errors += 1
+        return summarize(latencies, time.perf_counter() - start, errors)
+    finally:
+        stub.stop()
+
+
+def stage_ingest(args):
+    try:
+        import aiohttp
+        import ingestion
+    except ImportError as e:
+        return skipped(f"import failed: {e}")
+
+    stub, sim = _filled_gateway(args)
+    ingestion.HARDWARE_URL = stub.url
+
+    async def poll():
+        latencies, errors = [], 0
+        async with aiohttp.ClientSession() as session:
+            start = time.perf_counter()
+            for _ in range(args.polls):
+                packet = sim.next_packet()
+                if packet is not None:
+                    stub.send(packet)
+                t0 = time.perf_counter()
+                if await ingestion.fetch_real_data(session) is None:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - t0)
+            return summarize(latencies, time.perf_counter() - start, errors)
+
+    try:
+        return asyncio.run(poll())
+    finally:
+        stub.stop()
+
+
+def stage_score(args):
+    try:
+        import ml_model
+    except ImportError as e:
+        return skipped(f"import failed: {e}")
+
+    sim = _simulator(args)
+    rows = []
+    while len(rows) < args.score_count:
+        packet = sim.next_packet()
+        if packet is not None:
+            rows.append((packet.get("temp", 0.0), packet.get("vibration", 0.0), packet.get("humidity", 0.0)))
+    ml_model.get_risk_score(*rows[0])  # model load is not part of the steady state
+
+    latencies = []
+    start = time.perf_counter()
+    for temp, vib, hum in rows:
+        t0 = time.perf_counter()
+        ml_model.get_risk_score(temp, vib, hum)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def _scrape_lag(url):
+    """Stage lag series plus the hardware-to-Mongo histogram, keyed by stage name."""
+    try:
+        series = scrape_histogram(url, "pipeline_stage_lag_seconds")
+        series.update({(("stage", "end_to_end"),): buckets for buckets in
+                       scrape_histogram(url, "pipeline_end_to_end_lag_seconds").values()})
+        return series
+    except (urllib.error.URLError, OSError):
+        return None
+
+
+def stage_pipeline(args):
+    sink = PipelineSink(args.pipeline_url, timeout=2)
+    sim = _simulator(args)
+    try:
+        sink.send(sim.next_packet() or {"machine_id": "M01"})
+    except (urllib.error.URLError, OSError) as e:
+        return skipped(f"pipeline connector not reachable at {args.pipeline_url}: {e}")
+
+    before = _scrape_lag(args.pipeline_metrics_url)
+    driver = LoadDriver(sim, sink, args.rate, args.concurrency)
+    wall = driver.run(duration=args.duration)
+    result = summarize(driver.latencies, wall, driver.errors)
+
+    if before is not None:
+        # Let the last tumbling window close and reach the sink
+        time.sleep(args.settle)
+        after = _scrape_lag(args.pipeline_metrics_url) or {}
+        lag = {}
+        for key, buckets in diff_histograms(before, after).items():
+            stage = dict(key).get("stage", "")
+            lag[stage] = {
+                "count": int(buckets[-1][1]) if buckets else 0,
+                "p50_s_le": histogram_quantile(0.50, buckets),
+                "p99_s_le": histogram_quantile(0.99, buckets),
+            }
+        result["stage_lag"] = lag
+    return result
+
+
+def stage_mongo(args):
+    try:
+        sink = MongoSink(args.mongo_uri, database=BENCH_DATABASE)
+        sink.client.admin.command("ping")
+    except ImportError as e:
+        return skipped(f"import failed: {e}")
+    except Exception as e:
+        return skipped(f"mongo not reachable at {args.mongo_uri}: {e}")
+
+    try:
+        driver = LoadDriver(_simulator(args), sink, args.rate, args.concurrency)
+        wall = driver.run(duration=args.duration)
+        return summarize(driver.latencies, wall, driver.errors)
+    finally:
+        sink.client.drop_database(BENCH_DATABASE)
+        sink.client.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of " + ",".join(STAGES))
+    parser.add_argument("--machines", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=200.0, help="offered load for pipeline/mongo stages (packets/sec)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds for rate-driven stages")
+    parser.add_argument("--count", type=int, default=100000, help="packets for the generate stage")
+    parser.add_argument("--polls", type=int, default=2000, help="fetches for the gateway/ingest stages")
+    parser.add_argument("--score-count", type=int, default=2000, help="rows for the score stage")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anomaly-rate", type=float, default=0.01)
+    parser.add_argument("--fault-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--settle", type=float, default=7.0, help="seconds to wait for windows to flush before scraping")
+    parser.add_argument("--pipeline-url", default="http://localhost:8081/")
+    parser.add_argument("--pipeline-metrics-url", default="http://localhost:9101/metrics")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--out", default=None, help="write JSON results here (default: bench/results/<timestamp>.json)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.WARNING)
+    args = parse_args(argv)
+    selected = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(selected) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    results = {"meta": run_metadata(args), "stages": {}}
+    for name in selected:
+        print(f"[bench] {name} ...", file=sys.stderr, flush=True)
+        results["stages"][name] = globals()[f"stage_{name}"](args)
+
+    out = args.out or f"bench/results/{time.strftime('%Y%m%d-%H%M%S')}.json"
+    write_results(out, results)
+
+    print(f"{'stage':<10} {'count':>8} {'err':>5} {'rows/s':>12} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, r in results["stages"].items():
+        if "skipped" in r:
+            print(f"{name:<10} skipped: {r['skipped']}")
+            continue
+        print(f"{name:<10} {r['count']:>8} {r['errors']:>5} {r['throughput_per_s'] or 0:>12.1f} "
+              f"{r['p50_ms'] or 0:>10.3f} {r['p99_ms'] or 0:>10.3f}")
+    print(f"results: {out}")
+
+
+if __name__ == "__main__":
+    main()
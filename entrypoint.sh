@@ -7,5 +7,10 @@ PIPELINE_PID=$!
 python ingestion.py &
 INGESTION_PID=$!
 
-# Start the FastAPI server using uvicorn
-uvicorn api:app --host 0.0.0.0 --port 8000
+# Start the FastAPI server. With API_WORKERS > 1, use gunicorn's pre-fork
+# mode so workers share the imported LLM SDKs (see gunicorn.conf.py).
+if [ "${API_WORKERS:-1}" -gt 1 ]; then
+    gunicorn -c gunicorn.conf.py api:app
+else
+    uvicorn api:app --host 0.0.0.0 --port 8000
+fi
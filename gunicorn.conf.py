@@ -0,0 +1,27 @@
+"""
+Pre-fork mode for the API: `gunicorn -c gunicorn.conf.py api:app`.
+
+The master imports the app and the LLM SDKs once, then forks; workers share
+those pages copy-on-write instead of each importing them again. Mongo clients
+are still created per worker by the FastAPI lifespan hook.
+
+Each worker keeps its own metrics registry, so METRICS_MULTIPROC_DIR is set
+here (before the app is imported) and every worker writes its snapshot there;
+/metrics merges them, whichever worker answers the scrape (see telemetry.py).
+"""
+import os
+import tempfile
+
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "api-metrics"))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("API_WORKERS", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def on_starting(server):
+    import telemetry
+    telemetry.clear_multiprocess_dir()
+    import api
+    api.preload()
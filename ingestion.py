@@ -1,8 +1,13 @@
 import aiohttp
 import asyncio
 import json
+import logging
 import time
 import os
+import telemetry
+from telemetry import Counter, Gauge, Histogram, LAG_BUCKETS
+
+log = logging.getLogger("ingestion")
 
 # Configuration
 # HARDWARE_URL = "https://optical-readers-graphics-northeast.trycloudflare.com/stream"
@@ -11,6 +16,17 @@ import os
 HARDWARE_URL = os.getenv("STREAM_URL", "https://optical-readers-graphics-northeast.trycloudflare.com/stream")
 PATHWAY_URL = "http://localhost:8081/"
 POLL_INTERVAL = 5
+METRICS_PORT = int(os.getenv("INGESTION_METRICS_PORT", "9102"))
+
+FETCH_LATENCY = Histogram("ingest_fetch_latency_seconds", "Hardware gateway fetch latency", ["outcome"])
+PUSH_LATENCY = Histogram("ingest_push_latency_seconds", "POST latency to the Pathway connector")
+HARDWARE_LAG = Histogram(
+    "ingest_hardware_lag_seconds",
+    "Lag between the hardware packet timestamp and ingestion",
+    buckets=LAG_BUCKETS,
+)
+PACKETS = Counter("ingest_packets_total", "Packets seen from the hardware gateway", ["status"])
+LAST_HW_TIMESTAMP = Gauge("ingest_last_hardware_timestamp", "Most recent hardware timestamp accepted")
 
 import asyncio
 
@@ -18,23 +34,34 @@ if os.name == 'nt':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 async def fetch_real_data(session):
+    start = time.perf_counter()
+    outcome = "error"
     try:
         async with session.get(HARDWARE_URL, timeout=4) as response:
             if response.status == 200:
                 text = await response.text()
                 data = json.loads(text)
+                outcome = "ok"
                 return data
             else:
-                print(f"⚠️ Hardware Status: {response.status}")
+                outcome = "http_error"
+                log.warning("event=hardware_status status=%s", response.status)
                 return None
     except Exception as e:
-        print(f"⚠️ Hardware Unreachable: {e}")
+        log.warning("event=hardware_unreachable error=%r", e)
         return None
+    finally:
+        FETCH_LATENCY.labels(outcome).observe(time.perf_counter() - start)
+
+def hardware_time(hw_ts, now):
+    """Hardware timestamp as epoch seconds, or 0.0 when it can't be compared to wall-clock time."""
+    # Hardware clocks report either epoch seconds or milliseconds; anything
+    # else (uptime counters, zero) is not comparable to wall-clock time.
+    ts = hw_ts / 1000 if hw_ts > 1e12 else float(hw_ts)
+    return ts if 0 <= now - ts < 86400 else 0.0
 
 async def run_ingestion():
-    print(f"🚀 Starting STRICT Ingestion Engine (M01 Only)...")
-    print(f"📡 Source: {HARDWARE_URL}")
-    print(f"🛑 Simulation: DISABLED")
+    log.info("event=ingestion_started source=%s target=%s simulation=disabled", HARDWARE_URL, PATHWAY_URL)
     
     last_timestamp = 0
     
@@ -50,7 +77,7 @@ async def run_ingestion():
                     # Handle list response
                     if isinstance(real_data, list):
                         if len(real_data) == 0:
-                            print("⚠️ Empty list from hardware")
+                            log.warning("event=empty_packet_list")
                             continue
                         # Get the LATEST packet (last item in the list)
                         real_data = real_data[-1]
@@ -68,23 +95,29 @@ async def run_ingestion():
                     try:
                         hw_ts = int(raw_ts)
                     except ValueError:
-                        print(f"⚠️ Invalid timestamp format: {raw_ts}")
+                        log.warning("event=invalid_timestamp raw=%r", raw_ts)
                         hw_ts = 0
 
                     server_time = str(real_data.get("server_time", ""))
 
-                    print(f"📥 [FETCHED] {real_data}")
-                    print(f"🕒 Timestamp: {hw_ts} (Raw: {raw_ts})")
+                    log.debug("event=fetched packet=%s hw_ts=%s raw_ts=%r", real_data, hw_ts, raw_ts)
 
                     if hw_ts == 0:
-                        print("⚠️ Timestamp is 0! Data might be rejected as duplicate if it doesn't change.")
+                        log.warning("event=zero_timestamp note=packet_may_be_dropped_as_duplicate")
 
                     status = "DUPLICATE"
+                    ingest_time = time.time()
+                    hw_time = 0.0
                     if hw_ts > last_timestamp:
                         status = "NEW"
                         last_timestamp = hw_ts
-                    
-                    print(f"🔍 Status: {status} (Current: {hw_ts} > Last: {last_timestamp})")
+                        LAST_HW_TIMESTAMP.set(hw_ts)
+                        hw_time = hardware_time(hw_ts, ingest_time)
+                        if hw_time:
+                            HARDWARE_LAG.observe(ingest_time - hw_time)
+
+                    PACKETS.labels(status.lower()).inc()
+                    log.debug("event=dedup status=%s hw_ts=%s last=%s", status, hw_ts, last_timestamp)
 
                     if status == "NEW":
                         payload = {
@@ -92,27 +125,31 @@ async def run_ingestion():
                             "temperature": temp,
                             "humidity": hum,
                             "vibration": vib,
-                            "timestamp": int(time.time()), # Use Ingestion Time for consistent windowing
+                            "timestamp": int(ingest_time), # Use Ingestion Time for consistent windowing
+                            "hardware_timestamp": hw_time, # Epoch seconds, 0.0 if unknown; for end-to-end lag
+                            "ingest_time": ingest_time,
                             "signal_strength": rssi,
                             "server_time": server_time,
                             "source": "REAL"
                         }
                         
-                        print(f"🟢 [INGEST] Packet: {m_id} | T:{temp}C H:{hum}% V:{vib}g RSSI:{rssi}")
-                        
+                        log.debug("event=ingest machine_id=%s temp=%s humidity=%s vib=%s rssi=%s", m_id, temp, hum, vib, rssi)
+
                         # 3. Push to Pipeline
-                        async with session.post(PATHWAY_URL, json=payload, timeout=3) as resp:
-                            if resp.status == 200:
-                                pass # Silent success
-                            else:
-                                print(f"❌ Pathway Error {resp.status}")
+                        with PUSH_LATENCY.time():
+                            async with session.post(PATHWAY_URL, json=payload, timeout=3) as resp:
+                                if resp.status == 200:
+                                    pass # Silent success
+                                else:
+                                    log.error("event=pathway_error status=%s", resp.status)
                     else:
-                        print("⏭️ Skipping duplicate packet.")
-                            
+                        log.debug("event=skip_duplicate hw_ts=%s", hw_ts)
+
                 except Exception as e:
-                    print(f"❌ Parse/Send Error: {e}")
+                    PACKETS.labels("error").inc()
+                    log.error("event=parse_or_send_failed error=%r", e)
             else:
-                print("⏳ Waiting for hardware stream...", end="\r")
+                log.debug("event=waiting_for_hardware")
 
             # Wait
             elapsed = time.time() - start_time
@@ -120,7 +157,9 @@ async def run_ingestion():
             await asyncio.sleep(sleep_time)
 
 if __name__ == "__main__":
+    telemetry.configure_logging()
+    telemetry.start_http_server(METRICS_PORT)
     try:
         asyncio.run(run_ingestion())
     except KeyboardInterrupt:
-        print("Stopped.")
+        log.info("event=ingestion_stopped")
@@ -0,0 +1,383 @@
+"""
+Seeded, configurable load generator for the predictive-maintenance stack.
+
+One simulator produces sensor readings for N machines at R packets/sec with
+optional anomaly episodes and fault injection, and can drive any stage:
+
+  gateway   serve a stub hardware /stream endpoint for ingestion.py
+  pipeline  POST directly to the Pathway HTTP connector (pipeline.py)
+  mongo     upsert machine documents the way the pipeline sink does
+  stdout    print pipeline payloads as JSON lines
+
+Everything runs locally; the same --seed always yields the same stream.
+
+Timestamp faults (duplicate, zero_timestamp, bad_timestamp) only reach the
+wire on the gateway target, where ingestion.py has to deal with them. The
+other targets stand in for stages after ingestion, so the driver drops
+those packets there the way ingestion's dedup would.
+
+    python load_generator.py --target gateway --machines 10 --rate 20 --duration 60
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import telemetry
+from alert_levels import status_message
+
+log = logging.getLogger("load_generator")
+
+# Normal operating band, matches the data ml_model trains its Isolation Forest on
+BASELINE = {"temp": (41.0, 1.5), "vibration": (0.25, 0.05), "humidity": (50.0, 5.0)}
+
+# Anomaly episodes: offsets applied on top of the baseline for a few packets
+ANOMALIES = {
+    "overheat": {"temp": 15.0},
+    "bearing_wear": {"vibration": 0.6},
+    "condensation": {"humidity": 35.0},
+}
+
+# Packet-level faults the ingestion path has to survive
+FAULTS = ("drop", "duplicate", "zero_timestamp", "bad_timestamp", "missing_field")
+# Faults ingestion resolves by skipping the packet as a duplicate
+TIMESTAMP_FAULTS = ("duplicate", "zero_timestamp", "bad_timestamp")
+
+TARGETS = ("gateway", "pipeline", "mongo", "stdout")
+
+
+def machine_ids(n):
+    return [f"M{i:02d}" for i in range(1, n + 1)]
+
+
+def heuristic_risk(temp, vib, humidity):
+    """Cheap stand-in for the Isolation Forest: distance from the normal band squashed to 0-1."""
+    z = max(
+        abs(temp - BASELINE["temp"][0]) / BASELINE["temp"][1],
+        abs(vib - BASELINE["vibration"][0]) / BASELINE["vibration"][1],
+        abs(humidity - BASELINE["humidity"][0]) / BASELINE["humidity"][1],
+    )
+    return min(0.99, max(0.01, 1 / (1 + math.exp(4 - z))))
+
+
+class SensorSimulator:
+    """Deterministic stream of hardware-format packets for a fleet of machines."""
+
+    def __init__(self, machines=1, seed=42, anomaly_rate=0.0, fault_rate=0.0, anomaly_length=6):
+        self.rng = random.Random(seed)
+        self.machines = machine_ids(machines)
+        self.anomaly_rate = anomaly_rate
+        self.fault_rate = fault_rate
+        self.anomaly_length = anomaly_length
+        self._episodes = {}  # machine_id -> [kind, packets_left]
+        self._last_ts = {}
+        self._cursor = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.stats = {"packets": 0, "anomalies": 0, "faults": 0}
+
+    def _reading(self, m_id):
+        rng = self.rng
+        values = {k: rng.gauss(mu, sigma) for k, (mu, sigma) in BASELINE.items()}
+
+        episode = self._episodes.get(m_id)
+        if episode is None and rng.random() < self.anomaly_rate:
+            episode = self._episodes[m_id] = [rng.choice(sorted(ANOMALIES)), self.anomaly_length]
+            self.stats["anomalies"] += 1
+        if episode is not None:
+            for key, offset in ANOMALIES[episode[0]].items():
+                values[key] += offset
+            episode[1] -= 1
+            if episode[1] <= 0:
+                del self._episodes[m_id]
+        return values, episode[0] if episode else None
+
+    def next_packet(self, now=None):
+        """Next packet in hardware schema, or None when a 'drop' fault swallowed it."""
+        # Shared across request threads by the API's synthetic feed
+        with self._lock:
+            return self._next_packet(time.time() if now is None else now)
+
+    def _next_packet(self, now):
+        m_id = self.machines[self._cursor]
+        self._cursor = (self._cursor + 1) % len(self.machines)
+        self._seq += 1
+
+        values, anomaly = self._reading(m_id)
+        ts = max(int(now * 1000), self._last_ts.get(m_id, 0) + 1)
+        packet = {
+            "machine_id": m_id,
+            "temp": round(values["temp"], 2),
+            "humidity": round(values["humidity"], 2),
+            "vibration": round(values["vibration"], 3),
+            "rssi": self.rng.randint(-70, -50),
+            "timestamp": ts,
+            "server_time": datetime.fromtimestamp(now).isoformat(),
+            "seq": self._seq,
+        }
+        if anomaly:
+            packet["anomaly"] = anomaly
+
+        if self.fault_rate and self.rng.random() < self.fault_rate:
+            fault = self.rng.choice(FAULTS)
+            self.stats["faults"] += 1
+            if fault == "drop":
+                return None
+            packet["fault"] = fault
+            if fault == "duplicate":
+                packet["timestamp"] = self._last_ts.get(m_id, ts)
+            elif fault == "zero_timestamp":
+                packet["timestamp"] = 0
+            elif fault == "bad_timestamp":
+                packet["timestamp"] = "not-a-number"
+            elif fault == "missing_field":
+                del packet[self.rng.choice(("temp", "humidity", "vibration"))]
+
+        if isinstance(packet["timestamp"], int) and packet["timestamp"] > 0:
+            self._last_ts[m_id] = max(self._last_ts.get(m_id, 0), packet["timestamp"])
+        self.stats["packets"] += 1
+        return packet
+
+
+def to_pipeline_payload(packet, now=None):
+    """Map a hardware packet onto pipeline.InputSchema the same way ingestion.py does."""
+    now = time.time() if now is None else now
+    hw_ts = packet.get("timestamp")
+    return {
+        "machine_id": str(packet.get("machine_id", "M01")),
+        "temperature": float(packet.get("temp", 0.0)),
+        "humidity": float(packet.get("humidity", 0.0)),
+        "vibration": float(packet.get("vibration", 0.0)),
+        "timestamp": int(now),
+        "hardware_timestamp": hw_ts / 1000 if isinstance(hw_ts, int) and hw_ts > 0 else 0.0,
+        "ingest_time": now,
+        "signal_strength": int(packet.get("rssi", -100)),
+        "server_time": str(packet.get("server_time", "")),
+        "source": "LOADGEN",
+    }
+
+
+def to_machine_doc(packet, source="LOADGEN"):
+    """Build a machines document in the shape the API and dashboard read."""
+    temp = float(packet.get("temp", 0.0))
+    vib = float(packet.get("vibration", 0.0))
+    hum = float(packet.get("humidity", 0.0))
+    rssi = int(packet.get("rssi", -100))
+    risk = heuristic_risk(temp, vib, hum)
+    return {
+        "machine_id": str(packet.get("machine_id", "M01")),
+        "temperature": round(temp, 1),
+        "avg_temp": round(temp, 1),
+        "vibration": round(vib, 3),
+        "avg_vibration": round(vib, 3),
+        "humidity": round(hum, 1),
+        "avg_humidity": round(hum, 1),
+        "signal_strength": rssi,
+        "avg_rssi": rssi,
+        "failure_risk": round(risk, 3),
+        "timestamp": datetime.now().isoformat(),
+        "source": source,
+        "message": status_message(risk),
+    }
+
+
+# ─── Sinks ────────────────────────────────────────────────────────────────────
+
+class GatewayStub:
+    """Local stand-in for the hardware /stream endpoint that ingestion.py polls."""
+
+    # Packets are served as-is, timestamp faults included, for ingestion to handle
+    raw_packets = True
+
+    def __init__(self, host="127.0.0.1", port=0, backlog=50, error_rate=0.0, seed=42):
+        self.packets = deque(maxlen=backlog)
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                if self.path.split("?", 1)[0] != "/stream":
+                    self.send_error(404)
+                    return
+                with stub._lock:
+                    fail = stub.error_rate and stub.rng.random() < stub.error_rate
+                    body = json.dumps(list(stub.packets)).encode("utf-8")
+                if fail:
+                    self.send_error(503)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}/stream"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="gateway-stub", daemon=True).start()
+        log.info("event=gateway_stub_started url=%s", self.url)
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def send(self, packet):
+        with self._lock:
+            self.packets.append(packet)
+
+
+class PipelineSink:
+    """POST packets straight to the Pathway rest_connector, bypassing ingestion."""
+
+    def __init__(self, url="http://localhost:8081/", timeout=3):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, packet):
+        body = json.dumps(to_pipeline_payload(packet)).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            resp.read()
+
+
+class MongoSink:
+    """Upsert machine documents, one per packet, like pipeline.push_to_mongo."""
+
+    def __init__(self, uri="mongodb://localhost:27017/", database="predictive_maintenance", collection="machines"):
+        from pymongo import MongoClient
+        self.client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+        self.col = self.client[database][collection]
+
+    def send(self, packet):
+        doc = to_machine_doc(packet)
+        self.col.update_one({"machine_id": doc["machine_id"]}, {"$set": doc}, upsert=True)
+
+
+class StdoutSink:
+    def send(self, packet):
+        print(json.dumps(to_pipeline_payload(packet)), flush=True)
+
+
+# ─── Driver ───────────────────────────────────────────────────────────────────
+
+class LoadDriver:
+    """
+    Open-loop driver: packet i is due at start + i/rate regardless of how long
+    earlier sends took. Latency is measured from the due time, so a stalled
+    sink shows up in the tail instead of silently lowering the offered load.
+    """
+
+    def __init__(self, simulator, sink, rate=10.0, concurrency=4):
+        self.simulator = simulator
+        self.sink = sink
+        self.rate = rate
+        self.concurrency = concurrency
+        self.latencies = []
+        self.errors = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def _send(self, packet, due):
+        try:
+            self.sink.send(packet)
+            ok = True
+        except Exception as e:
+            ok = False
+            log.debug("event=send_failed error=%r", e)
+        elapsed = time.perf_counter() - due
+        with self._lock:
+            if ok:
+                self.latencies.append(elapsed)
+            else:
+                self.errors += 1
+
+    def run(self, duration=None, count=None):
+        """Drive the sink for `duration` seconds or `count` packets. Returns wall time."""
+        total = count if count is not None else int(duration * self.rate)
+        interval = 1.0 / self.rate
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for i in range(total):
+                due = start + i * interval
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                packet = self.simulator.next_packet()
+                if packet is None:
+                    continue
+                if packet.get("fault") in TIMESTAMP_FAULTS and not getattr(self.sink, "raw_packets", False):
+                    self.skipped += 1
+                    continue
+                pool.submit(self._send, packet, due)
+        return time.perf_counter() - start
+
+
+def build_sink(args):
+    if args.target == "gateway":
+        return GatewayStub(args.host, args.port, error_rate=args.fault_rate, seed=args.seed).start()
+    if args.target == "pipeline":
+        return PipelineSink(args.pipeline_url)
+    if args.target == "mongo":
+        return MongoSink(args.mongo_uri)
+    return StdoutSink()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=TARGETS, default="stdout")
+    parser.add_argument("--machines", type=int, default=1, help="fleet size N")
+    parser.add_argument("--rate", type=float, default=1.0, help="packets/sec R across the fleet")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to run (default: forever)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anomaly-rate", type=float, default=0.0, help="chance a packet starts an anomaly episode")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="chance a packet (or gateway poll) is faulted")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--host", default="127.0.0.1", help="gateway stub bind address")
+    parser.add_argument("--port", type=int, default=8090, help="gateway stub port")
+    parser.add_argument("--pipeline-url", default="http://localhost:8081/")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    telemetry.configure_logging()
+    args = parse_args(argv)
+    sim = SensorSimulator(args.machines, args.seed, args.anomaly_rate, args.fault_rate)
+    sink = build_sink(args)
+    if args.target == "gateway":
+        log.info("event=hint run='STREAM_URL=%s python ingestion.py'", sink.url)
+
+    driver = LoadDriver(sim, sink, args.rate, args.concurrency)
+    try:
+        if args.duration is None:
+            while True:
+                driver.run(count=max(1, int(args.rate * 10)))
+                log.info("event=progress packets=%d errors=%d", sim.stats["packets"], driver.errors)
+        wall = driver.run(duration=args.duration)
+        log.info("event=done packets=%d errors=%d skipped=%d anomalies=%d faults=%d wall_s=%.2f",
+                 sim.stats["packets"], driver.errors, driver.skipped, sim.stats["anomalies"], sim.stats["faults"], wall)
+    except KeyboardInterrupt:
+        log.info("event=stopped packets=%d", sim.stats["packets"])
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,20 @@ import numpy as np
 from sklearn.ensemble import IsolationForest
 import joblib
 import os
+import logging
 import warnings
+from telemetry import Histogram, Counter
+
+log = logging.getLogger(__name__)
 
 # Suppress sklearn warnings if needed
 warnings.filterwarnings("ignore")
 
 MODEL_PATH = "pipeline_model.joblib"
 
+SCORE_LATENCY = Histogram("ml_score_latency_seconds", "Isolation Forest inference time per window")
+SCORE_ERRORS = Counter("ml_score_errors_total", "Inference failures that fell back to the default risk")
+
 class AnomalyDetector:
     def __init__(self):
         self.clf = None
@@ -55,10 +62,11 @@ class AnomalyDetector:
             raw_score = self.clf.decision_function(X)[0]
             risk = 1 / (1 + np.exp(15 * raw_score))
             final_risk = float(np.clip(risk, 0.0, 1.0))
-            print(f"🧠 [ML] Inference: T={temp}, V={vib}, H={humidity} -> Risk={final_risk:.4f}")
+            log.debug("event=inference temp=%s vib=%s humidity=%s risk=%.4f", temp, vib, humidity, final_risk)
             return final_risk
         except Exception as e:
-            print(f"❌ ML PREDICT ERROR: {e}")
+            SCORE_ERRORS.inc()
+            log.error("event=inference_failed error=%r", e)
             return 0.5 # Default fallback risk
 
 # Singleton instance for the pipeline to use
@@ -68,7 +76,8 @@ def get_risk_score(temp, vib, humidity):
     """
     Returns a probability-based risk score (0-1) using Isolation Forest.
     """
-    return _detector.predict(temp, vib, humidity)
+    with SCORE_LATENCY.time():
+        return _detector.predict(temp, vib, humidity)
 
 if __name__ == "__main__":
     _detector.train()
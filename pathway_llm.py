@@ -1,55 +1,65 @@
 import os
 import sys
+import logging
+import threading
 from dotenv import load_dotenv
+from telemetry import Counter, Histogram, LLM_BUCKETS
 
 load_dotenv()
 
+log = logging.getLogger("pathway_llm")
+
 MODEL_NAME = "groq/llama-3.3-70b-versatile"
 TEMPERATURE = 0.7
-PATHWAY_INSTALLED = False
-
-try:
-    import pathway as pw
-    from pathway.xpacks.llm.llms import LiteLLMChat as RealLiteLLMChat
-    PATHWAY_INSTALLED = True
-    print("[Pathway] Using REAL Pathway engine.")
-except ImportError:
-    print("[Pathway] Windows shim active.")
-
-if not PATHWAY_INSTALLED:
-    try:
-        from groq import Groq
-        GROQ_AVAILABLE = True
-    except ImportError:
-        GROQ_AVAILABLE = False
-        import requests
-        import time
-
-    class LiteLLMChat:
-        def __init__(self, model="llama-3.3-70b-versatile", api_key=None, temperature=0.7, top_p=0.9):
-            self.temperature = temperature
-            self.top_p = top_p
-            if GROQ_AVAILABLE:
-                groq_key = os.getenv("GROQ_API_KEY") or api_key
-                if groq_key:
-                    self.client = Groq(api_key=groq_key)
-                    self.model = "llama-3.3-70b-versatile" 
-                    self.use_groq = True
-                else:
-                    self.use_groq = False
-                    self.api_key = os.getenv("GOOGLE_API_KEY")
+# Resolved by get_llm() on first use; pathway and its LLM xpack take seconds to import
+PATHWAY_INSTALLED = None
+
+LLM_LATENCY = Histogram("llm_request_latency_seconds", "End-to-end LLM call latency", ["provider"], buckets=LLM_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the LLM provider", ["provider", "kind"])
+LLM_ERRORS = Counter("llm_errors_total", "Failed LLM calls", ["provider"])
+# No cache-hit counter: pw.udfs.DefaultCache doesn't report hits, and the
+# groq/gemini shim doesn't cache at all.
+
+def record_usage(provider, prompt_tokens=0, completion_tokens=0):
+    if prompt_tokens:
+        LLM_TOKENS.labels(provider, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(provider, "completion").inc(completion_tokens)
+
+def record_gemini_usage(body):
+    usage = body.get("usageMetadata") or {}
+    record_usage("gemini", usage.get("promptTokenCount", 0), usage.get("candidatesTokenCount", 0))
+
+class LiteLLMChat:
+    def __init__(self, model="llama-3.3-70b-versatile", api_key=None, temperature=0.7, top_p=0.9):
+        self.temperature = temperature
+        self.top_p = top_p
+        try:
+            from groq import Groq
+        except ImportError:
+            Groq = None
+        if Groq is not None:
+            groq_key = os.getenv("GROQ_API_KEY") or api_key
+            if groq_key:
+                self.client = Groq(api_key=groq_key)
+                self.model = "llama-3.3-70b-versatile" 
+                self.use_groq = True
             else:
                 self.use_groq = False
                 self.api_key = os.getenv("GOOGLE_API_KEY")
+        else:
+            self.use_groq = False
+            self.api_key = os.getenv("GOOGLE_API_KEY")
 
-        def __call__(self, prompt, **kwargs): return self.generate(prompt, **kwargs)
+    def __call__(self, prompt, **kwargs): return self.generate(prompt, **kwargs)
 
-        def generate(self, prompt, max_retries=2):
-            return self._generate_groq(prompt, max_retries) if self.use_groq else self._generate_gemini(prompt, max_retries)
+    def generate(self, prompt, max_retries=2):
+        return self._generate_groq(prompt, max_retries) if self.use_groq else self._generate_gemini(prompt, max_retries)
 
-        def _generate_groq(self, prompt, max_retries):
-            print(f"🤖 [AI] Querying Groq ({self.model})...")
-            try:
+    def _generate_groq(self, prompt, max_retries):
+        log.debug("event=llm_request provider=groq model=%s", self.model)
+        try:
+            with LLM_LATENCY.labels("groq").time():
                 response = self.client.chat.completions.create(
                     model=self.model.replace("groq/", ""),
                     messages=[{"role": "user", "content": prompt}],
@@ -57,42 +67,99 @@ if not PATHWAY_INSTALLED:
                     top_p=self.top_p,
                     max_tokens=2048
                 )
-                print("✅ [AI] Groq Success.")
-                return response.choices[0].message.content
-            except Exception as e: 
-                print(f"❌ [AI] Groq Failed: {e}")
-                return self._generate_gemini(prompt, max_retries)
-
-        def _generate_gemini(self, prompt, max_retries):
-            import requests, time
-            models = ["gemini-2.0-flash", "gemini-1.5-flash"]
-            for model_name in models:
-                url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={self.api_key}"
-                for attempt in range(max_retries):
-                    try:
+            usage = getattr(response, "usage", None)
+            if usage:
+                record_usage("groq", usage.prompt_tokens, usage.completion_tokens)
+            return response.choices[0].message.content
+        except Exception as e: 
+            LLM_ERRORS.labels("groq").inc()
+            log.warning("event=llm_failed provider=groq error=%r", e)
+            return self._generate_gemini(prompt, max_retries)
+
+    def _generate_gemini(self, prompt, max_retries):
+        import requests, time
+        models = ["gemini-2.0-flash", "gemini-1.5-flash"]
+        for model_name in models:
+            url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={self.api_key}"
+            for attempt in range(max_retries):
+                try:
+                    with LLM_LATENCY.labels("gemini").time():
                         response = requests.post(
                             url, headers={'Content-Type': 'application/json'},
                             json={"contents": [{"parts": [{"text": prompt}]}]}, timeout=30
                         )
-                        if response.status_code == 200:
-                            return response.json()['candidates'][0]['content']['parts'][0]['text']
-                    except: break
-            return "AI service busy."
+                    if response.status_code == 200:
+                        body = response.json()
+                        record_gemini_usage(body)
+                        return body['candidates'][0]['content']['parts'][0]['text']
+                    LLM_ERRORS.labels("gemini").inc()
+                except:
+                    LLM_ERRORS.labels("gemini").inc()
+                    break
+        return "AI service busy."
 
 api_key = os.getenv("GROQ_API_KEY")
 
-if PATHWAY_INSTALLED:
-    llm_chat = RealLiteLLMChat(
-        model=MODEL_NAME,
-        temperature=TEMPERATURE,
-        retry_strategy=pw.udfs.FixedDelayRetryStrategy(delay_ms=1000, max_retries=2),
-        cache_strategy=pw.udfs.DefaultCache()
-    )
-else:
-    llm_chat = LiteLLMChat(model=MODEL_NAME.replace("groq/", ""), api_key=api_key, temperature=TEMPERATURE)
+_llm_chat = None
+_litellm = None
+_load_lock = threading.Lock()
+
+def get_llm():
+    """Build the chat backend on first use instead of at import time."""
+    global _llm_chat, PATHWAY_INSTALLED
+    if _llm_chat is not None:
+        return _llm_chat
+    with _load_lock:
+        if _llm_chat is None:
+            try:
+                import pathway as pw
+                from pathway.xpacks.llm.llms import LiteLLMChat as RealLiteLLMChat
+            except ImportError:
+                log.info("event=llm_backend backend=shim")
+                chat = LiteLLMChat(model=MODEL_NAME.replace("groq/", ""), api_key=api_key, temperature=TEMPERATURE)
+                installed = False
+            else:
+                log.info("event=llm_backend backend=pathway")
+                chat = RealLiteLLMChat(
+                    model=MODEL_NAME,
+                    temperature=TEMPERATURE,
+                    retry_strategy=pw.udfs.FixedDelayRetryStrategy(delay_ms=1000, max_retries=2),
+                    cache_strategy=pw.udfs.DefaultCache()
+                )
+                installed = True
+            # Publish only after the backend is built, so a failing constructor
+            # leaves nothing half-set and the next call retries. The flag goes
+            # first because callers read _llm_chat, then PATHWAY_INSTALLED.
+            PATHWAY_INSTALLED = installed
+            _llm_chat = chat
+    return _llm_chat
+
+def _load_litellm():
+    global _litellm
+    if _litellm is None:
+        import litellm
+        _litellm = litellm
+    return _litellm
+
+def preload():
+    """Import every LLM dependency now, e.g. in a pre-fork master so workers share the pages."""
+    get_llm()
+    if PATHWAY_INSTALLED:
+        _load_litellm()
+
+def _litellm_completion(prompt):
+    litellm = _load_litellm()
+    with LLM_LATENCY.labels("litellm").time():
+        resp = litellm.completion(model=MODEL_NAME, messages=[{"role": "user", "content": prompt}], temperature=TEMPERATURE)
+    usage = getattr(resp, "usage", None)
+    record_usage("litellm", getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0)
+    return resp.choices[0].message.content
 
 class PathwayRAGService:
-    def __init__(self, llm): self.llm = llm
+    def __init__(self, llm=None): self._llm = llm
+
+    @property
+    def llm(self): return self._llm or get_llm()
 
     def answer(self, question, context, additional_context=""):
         prompt = f"""You are an industrial AI assistant. Answer efficiently.
@@ -102,23 +169,24 @@ Current Machine Data:
 User Question: {question}
 Answer ONLY what is asked. Keep it brief."""
         
+        llm = self.llm
         if PATHWAY_INSTALLED:
-            try: return self.llm.__wrapped__(prompt)
+            try:
+                with LLM_LATENCY.labels("pathway").time():
+                    return llm.__wrapped__(prompt)
             except:
-                import litellm
-                resp = litellm.completion(model=MODEL_NAME, messages=[{"role": "user", "content": prompt}], temperature=TEMPERATURE)
-                return resp.choices[0].message.content
-        else: return self.llm(prompt)
+                LLM_ERRORS.labels("pathway").inc()
+                return _litellm_completion(prompt)
+        else: return llm(prompt)
 
     def generate_insights(self, context):
         prompt = f"""Analyze this machine data:
 {context}
 Provide: System Health, Critical Issues, At-Risk Machines, Actions, Maintenance, Energy Efficiency. Use bullet points."""
         
+        llm = self.llm
         if PATHWAY_INSTALLED:
-            import litellm
-            resp = litellm.completion(model=MODEL_NAME, messages=[{"role": "user", "content": prompt}], temperature=TEMPERATURE)
-            return resp.choices[0].message.content
-        else: return self.llm(prompt)
+            return _litellm_completion(prompt)
+        else: return llm(prompt)
 
-pathway_rag_service = PathwayRAGService(llm=llm_chat)
+pathway_rag_service = PathwayRAGService()
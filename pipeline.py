@@ -1,23 +1,51 @@
 import pathway as pw
 from datetime import datetime
+import logging
 import os
+import time
 from pymongo import MongoClient, UpdateOne
 import ml_model
+import alerts
 import socket
+import telemetry
+from telemetry import Counter, Histogram, LAG_BUCKETS
+
+log = logging.getLogger("pipeline")
+
+PIPELINE_PORT = int(os.getenv("PIPELINE_PORT", "8081"))
+METRICS_PORT = int(os.getenv("PIPELINE_METRICS_PORT", "9101"))
+
+INPUT_ROWS = Counter("pipeline_input_rows_total", "Rows received by the HTTP connector")
+SINK_ROWS = Counter("pipeline_sink_rows_total", "Scored window rows delivered to the sink")
+STAGE_LAG = Histogram(
+    "pipeline_stage_lag_seconds",
+    "Wall-clock lag from the ingestion time of the newest row to each pipeline stage",
+    ["stage"],
+    buckets=LAG_BUCKETS,
+)
+END_TO_END_LAG = Histogram(
+    "pipeline_end_to_end_lag_seconds",
+    "Lag from the hardware timestamp of the newest row in a window to its Mongo write",
+    buckets=LAG_BUCKETS,
+)
+MONGO_WRITE_LATENCY = Histogram("pipeline_mongo_write_latency_seconds", "machines upsert latency")
+MONGO_WRITE_ERRORS = Counter("pipeline_mongo_write_errors_total", "Failed machines upserts")
 
 # Configuration
 MONGO_AVAILABLE = False
 machines_col = None
+alerts_col = None
 
 try:
     mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
     client = MongoClient(mongo_uri, serverSelectionTimeoutMS=2000)
-    print(f"✅ Connected to MongoDB at {mongo_uri}")
+    log.info("event=mongo_connected uri=%s", mongo_uri)
     db = client["predictive_maintenance"]
     machines_col = db["machines"]
+    alerts_col = db["alerts"]
     MONGO_AVAILABLE = True
 except Exception as e:
-    print(f"⚠️ MONGO UNAVAILABLE: {e}")
+    log.warning("event=mongo_unavailable error=%r", e)
 
 # Define Schema corresponding to Ingestion output
 # Mapped from Hardware: temp->temperature, etc.
@@ -30,16 +58,32 @@ class InputSchema(pw.Schema):
     signal_strength: int
     server_time: str
     source: str
+    # Epoch seconds, float; 0.0 when the sender doesn't know them
+    hardware_timestamp: float = pw.column_definition(default_value=0.0)
+    ingest_time: float = pw.column_definition(default_value=0.0)
 
 def build_pipeline():
     # 1. Ingest from HTTP
     data, *extra = pw.io.http.rest_connector(
         host="0.0.0.0",
-        port=8081,
+        port=PIPELINE_PORT,
         schema=InputSchema,
         autocommit_duration_ms=1000
     )
 
+    ingest_lag = STAGE_LAG.labels("ingest")
+
+    def on_input(key, row, time_, is_addition):
+        if is_addition:
+            INPUT_ROWS.inc()
+            if row["ingest_time"]:
+                ingest_lag.observe(time.time() - row["ingest_time"])
+
+    # A per-row Python callback is the costliest piece of instrumentation, so
+    # METRICS_ENABLED=0 skips it entirely rather than running it as a no-op.
+    if telemetry.ENABLED:
+        pw.io.subscribe(data, on_input)
+
     # 2. Windowing & Aggregation
     # Tumbling window of 5 seconds based on event timestamp
     windowed_stats = data.windowby(
@@ -53,11 +97,18 @@ def build_pipeline():
         avg_humidity=pw.reducers.avg(pw.this.humidity),
         avg_rssi=pw.reducers.avg(pw.this.signal_strength),
         last_timestamp=pw.reducers.max(pw.this.timestamp),
+        last_ingest_time=pw.reducers.max(pw.this.ingest_time),
+        last_hardware_timestamp=pw.reducers.max(pw.this.hardware_timestamp),
+        window_start=pw.this._pw_window_start,
         source=pw.reducers.max(pw.this.source)
     )
 
     # 3. ML Scoring (Isolation Forest with 3 features)
-    def compute_risk(temp, vib, humidity):
+    window_lag = STAGE_LAG.labels("window")
+
+    def compute_risk(temp, vib, humidity, last_ingest_time):
+        if last_ingest_time:
+            window_lag.observe(time.time() - last_ingest_time)
         # Wrapper to handle potential None values safely (though reducers shouldn't produce None if data exists)
         t = temp if temp is not None else 0.0
         v = vib if vib is not None else 0.0
@@ -70,23 +121,51 @@ def build_pipeline():
         pw.this.avg_vibration,
         pw.this.avg_humidity,
         pw.this.avg_rssi,
-        failure_risk=pw.apply(compute_risk, pw.this.avg_temp, pw.this.avg_vibration, pw.this.avg_humidity),
+        failure_risk=pw.apply(compute_risk, pw.this.avg_temp, pw.this.avg_vibration, pw.this.avg_humidity, pw.this.last_ingest_time),
         timestamp=pw.this.last_timestamp,
+        last_ingest_time=pw.this.last_ingest_time,
+        last_hardware_timestamp=pw.this.last_hardware_timestamp,
+        window_start=pw.this.window_start,
         source=pw.this.source
     )
 
-    # 4. Output to MongoDB
-    def push_to_mongo(key, row, time, is_addition):
-        if not MONGO_AVAILABLE:
-            return
-        
+    # 4. Alerting: only state transitions leave this stage
+    alert_config = alerts.AlertConfig.from_env()
+    alert_engine = alerts.AlertEngine(alert_config)
+    notifier = alerts.AlertNotifier.from_env(alerts_col if MONGO_AVAILABLE else None)
+    if MONGO_AVAILABLE:
+        try:
+            alerts_col.create_index("alert_id", unique=True)
+            alerts_col.create_index("pushed_at")
+            alert_engine.restore(alerts.latest_states(alerts_col))
+        except Exception as e:
+            log.warning("event=alert_restore_failed error=%r", e)
+
+    # 5. Output to MongoDB, evaluating alerts first so the machine doc carries the new state
+    sink_lag = STAGE_LAG.labels("sink")
+
+    def push_to_mongo(key, row, time_, is_addition):
         if not is_addition:
             return
 
+        SINK_ROWS.inc()
+        if row["last_ingest_time"]:
+            sink_lag.observe(time.time() - row["last_ingest_time"])
+
+        machine_id = row["machine_id"]
+        transition = alert_engine.evaluate(machine_id, row["failure_risk"], row["window_start"])
+        if transition is not None:
+            notifier.publish(transition)
+
+        if not MONGO_AVAILABLE:
+            return
+
         try:
+            # Message follows the debounced engine state, not the raw threshold
+            state = alert_engine.state(machine_id)
             # Row is a dictionary-like object
             doc = {
-                "machine_id": row["machine_id"],
+                "machine_id": machine_id,
                 "temperature": row["avg_temp"],
                 "vibration": row["avg_vibration"],
                 "humidity": row["avg_humidity"],
@@ -94,30 +173,28 @@ def build_pipeline():
                 "failure_risk": row["failure_risk"],
                 "timestamp": datetime.now().isoformat(),
                 "source": row["source"],
-                "message": "Status OK"
+                "message": alerts.status_message(row["failure_risk"], alert_config.for_machine(machine_id), state),
+                "alert_state": state,
             }
-            
-            # Message logic
-            if row["failure_risk"] > 0.8:
-                doc["message"] = f"🔴 CRITICAL: Risk {row['failure_risk']:.2f}!"
-            elif row["failure_risk"] > 0.4:
-                doc["message"] = f"⚠️ WARNING: Risk {row['failure_risk']:.2f}."
-            else:
-                doc["message"] = f"✅ OPTIMAL (Risk {row['failure_risk']:.2f})."
-
-            print(f"💾 [MONGO] {doc['machine_id']} Updated | Time: {doc['timestamp']} | Risk: {doc['failure_risk']:.2f}", flush=True)
-            
-            machines_col.update_one(
-                {"machine_id": doc["machine_id"]},
-                {"$set": doc},
-                upsert=True
-            )
+
+            with MONGO_WRITE_LATENCY.time():
+                machines_col.update_one(
+                    {"machine_id": doc["machine_id"]},
+                    {"$set": doc},
+                    upsert=True
+                )
+            if row["last_hardware_timestamp"]:
+                END_TO_END_LAG.observe(time.time() - row["last_hardware_timestamp"])
+            log.debug("event=mongo_write machine_id=%s risk=%.2f", doc["machine_id"], doc["failure_risk"])
         except Exception as e:
-            print(f"⚠️ MONGO WRITE ERROR: {e}")
+            MONGO_WRITE_ERRORS.inc()
+            log.error("event=mongo_write_failed error=%r", e)
 
     pw.io.subscribe(scored_data, push_to_mongo)
     
     pw.run()
 
 if __name__ == "__main__":
+    telemetry.configure_logging()
+    telemetry.start_http_server(METRICS_PORT)
     build_pipeline()
@@ -0,0 +1,356 @@
+"""
+Lightweight Prometheus-format metrics and logging setup shared by the API,
+the Pathway pipeline and the ingestion engine.
+
+Metrics live in a process-wide registry and are rendered in the Prometheus
+text exposition format, either by the API's /metrics route or by the small
+embedded exporter started with start_http_server(). Pre-fork servers set
+METRICS_MULTIPROC_DIR so /metrics covers every worker (see below).
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+# Set METRICS_ENABLED=0 to turn every observe/inc/set into a no-op
+ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Request/processing latencies (seconds)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Event-time lag across the stream (seconds), windows are 5s wide
+LAG_BUCKETS = (0.5, 1.0, 2.0, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+# LLM calls are slow, token counts are large
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def configure_logging():
+    """Level-gated key=value logging, level taken from LOG_LEVEL (default INFO)."""
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="ts=%(asctime)s level=%(levelname)s logger=%(name)s %(message)s",
+    )
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        if not ENABLED:
+            return
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value):
+        if not ENABLED:
+            return
+        self.value = value
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("_upper", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self._upper = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if not ENABLED:
+            return
+        i = bisect.bisect_left(self._upper, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        self._unlabeled = None if self.labelnames else self.labels()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _value(self, child):
+        return child.value
+
+    def export(self):
+        """Plain-data snapshot: rendered directly, or written to disk in multiprocess mode."""
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "documentation": self.documentation,
+            "labelnames": list(self.labelnames),
+            "buckets": list(getattr(self, "buckets", ())),
+            "samples": [[list(key), self._value(child)] for key, child in list(self._children.items())],
+        }
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        self._unlabeled.inc(amount)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._unlabeled.set(value)
+
+    def dec(self, amount=1.0):
+        self._unlabeled.dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._unlabeled.observe(value)
+
+    def time(self):
+        return self._unlabeled.time()
+
+    def _value(self, child):
+        with child._lock:
+            return [list(child.counts), child.sum]
+
+
+def _render_metric(m):
+    lines = [f"# HELP {m['name']} {m['documentation']}", f"# TYPE {m['name']} {m['kind']}"]
+    for values, value in m["samples"]:
+        pairs = list(zip(m["labelnames"], values))
+        if m["kind"] != "histogram":
+            lines.append(f"{m['name']}{_format_labels(pairs)} {_format_value(value)}")
+            continue
+        counts, total = value
+        cumulative = 0
+        for upper, count in zip(m["buckets"] + [float("inf")], counts):
+            cumulative += count
+            le = ("le", _format_value(float(upper)))
+            lines.append(f"{m['name']}_bucket{_format_labels(pairs + [le])} {cumulative}")
+        lines.append(f"{m['name']}_sum{_format_labels(pairs)} {_format_value(total)}")
+        lines.append(f"{m['name']}_count{_format_labels(pairs)} {cumulative}")
+    return "\n".join(lines)
+
+
+def _export_all():
+    with _registry_lock:
+        metrics = list(_registry)
+    return [m.export() for m in metrics]
+
+
+# ─── Multiprocess mode ────────────────────────────────────────────────────────
+# Pre-fork servers (gunicorn.conf.py) run several workers, each with its own
+# registry, so a scrape would only see whichever worker answered it. With
+# METRICS_MULTIPROC_DIR set, every process periodically writes its snapshot
+# to <dir>/<pid>.json and render() merges all of them: counters and
+# histograms are summed across processes, gauges get a `pid` label. Files of
+# exited workers are kept so counters never go backwards (their gauges stay
+# too, frozen at the last value). The answering worker is always current;
+# the others can be up to one writer interval stale.
+
+MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+
+
+def _write_snapshot():
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    path = os.path.join(MULTIPROC_DIR, f"{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(_export_all(), f)
+    os.replace(tmp, path)
+
+
+def _read_snapshots():
+    snapshots = {}
+    for entry in os.listdir(MULTIPROC_DIR):
+        if not entry.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(MULTIPROC_DIR, entry)) as f:
+                snapshots[entry[:-len(".json")]] = json.load(f)
+        except (OSError, ValueError):
+            continue  # being replaced right now; picked up on the next scrape
+    return snapshots
+
+
+def merge_snapshots(snapshots):
+    """Combine {pid: [exported metric, ...]} into one list of exported metrics."""
+    merged = {}
+    for pid, metrics in sorted(snapshots.items()):
+        for m in metrics:
+            out = merged.get(m["name"])
+            if out is None:
+                out = merged[m["name"]] = dict(m, samples={})
+                if m["kind"] == "gauge":
+                    out["labelnames"] = m["labelnames"] + ["pid"]
+            for values, value in m["samples"]:
+                if m["kind"] == "gauge":
+                    out["samples"][tuple(values) + (pid,)] = value
+                    continue
+                key = tuple(values)
+                prev = out["samples"].get(key)
+                if prev is None:
+                    out["samples"][key] = value
+                elif m["kind"] == "histogram":
+                    out["samples"][key] = [[a + b for a, b in zip(prev[0], value[0])], prev[1] + value[1]]
+                else:
+                    out["samples"][key] = prev + value
+    for m in merged.values():
+        m["samples"] = [[list(k), v] for k, v in m["samples"].items()]
+    return list(merged.values())
+
+
+def clear_multiprocess_dir():
+    """Drop snapshots from a previous run. Call once in the master before forking."""
+    if not MULTIPROC_DIR:
+        return
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    for entry in os.listdir(MULTIPROC_DIR):
+        if entry.endswith((".json", ".tmp")):
+            os.remove(os.path.join(MULTIPROC_DIR, entry))
+
+
+def start_multiprocess_writer(interval=5.0):
+    """Start this process's snapshot writer. Call after fork (threads don't survive it)."""
+    if not MULTIPROC_DIR:
+        return
+
+    def loop():
+        while True:
+            try:
+                _write_snapshot()
+            except OSError as e:
+                log.warning("event=metrics_snapshot_failed error=%r", e)
+            time.sleep(interval)
+
+    threading.Thread(target=loop, name="metrics-snapshot", daemon=True).start()
+    atexit.register(_write_snapshot)
+
+
+def render():
+    """Render every registered metric (merged across workers in multiprocess mode)."""
+    if MULTIPROC_DIR:
+        _write_snapshot()
+        metrics = merge_snapshots(_read_snapshots())
+    else:
+        metrics = _export_all()
+    return "\n".join(_render_metric(m) for m in metrics) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, addr="0.0.0.0"):
+    """Serve /metrics from a daemon thread. Returns the server, or None if the port is taken."""
+    try:
+        server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    except OSError as e:
+        log.warning("event=metrics_exporter_failed port=%s error=%r", port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    log.info("event=metrics_exporter_started addr=%s port=%s", addr, port)
+    return server
@@ -0,0 +1,229 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import alerts
+from alerts import CRITICAL, OPTIMAL, WARNING, AlertConfig, AlertEngine, AlertNotifier
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query["alert_id"])
+        if doc is None:
+            if not upsert:
+                return
+            doc = self.docs[query["alert_id"]] = dict(update.get("$setOnInsert", {}))
+        doc.update(update.get("$set", {}))
+
+
+def feed(engine, machine_id, risks, start=0):
+    """Evaluate one risk per window (5s apart); returns the transitions."""
+    out = []
+    for i, risk in enumerate(risks):
+        t = engine.evaluate(machine_id, risk, start + i * 5)
+        if t is not None:
+            out.append(t)
+    return out
+
+
+def transition(machine_id, frm, to, window=0):
+    return {"alert_id": f"{machine_id}:{window}:{to}", "machine_id": machine_id, "from": frm, "to": to,
+            "risk": 0.5, "window": window, "timestamp": "", "message": ""}
+
+
+def notifier(**kwargs):
+    kwargs.setdefault("flush_interval_s", 0)
+    return AlertNotifier(**kwargs)
+
+
+# ─── AlertEngine ──────────────────────────────────────────────────────────────
+
+def test_escalates_after_debounce():
+    engine = AlertEngine()
+    assert feed(engine, "M1", [0.9]) == []
+    [t] = feed(engine, "M1", [0.9], start=5)
+    assert (t["from"], t["to"]) == (OPTIMAL, CRITICAL)
+    assert t["message"].startswith("🔴 CRITICAL")
+
+
+def test_hysteresis_stepping_down_from_critical():
+    engine = AlertEngine()
+    feed(engine, "M1", [0.9, 0.9])
+    # Just under critical (0.8) but inside the 0.05 margin: stays CRITICAL
+    assert feed(engine, "M1", [0.77, 0.77, 0.77], start=10) == []
+    assert engine.state("M1") == CRITICAL
+    [t] = feed(engine, "M1", [0.74, 0.74], start=25)
+    assert (t["from"], t["to"]) == (CRITICAL, WARNING)
+
+
+def test_hysteresis_stepping_down_from_warning():
+    engine = AlertEngine()
+    feed(engine, "M1", [0.5, 0.5])
+    assert engine.state("M1") == WARNING
+    assert feed(engine, "M1", [0.37, 0.37, 0.37], start=10) == []
+    assert engine.state("M1") == WARNING
+    [t] = feed(engine, "M1", [0.3, 0.3], start=25)
+    assert (t["from"], t["to"]) == (WARNING, OPTIMAL)
+
+
+def test_step_down_message_follows_engine_state():
+    engine = AlertEngine()
+    feed(engine, "M1", [0.9, 0.9])
+    # 0.38 is below the plain warning threshold but WARNING under hysteresis
+    [t] = feed(engine, "M1", [0.38, 0.38], start=10)
+    assert t["to"] == WARNING
+    assert t["message"].startswith("⚠️ WARNING")
+
+
+def test_same_window_redelivered_does_not_advance_debounce():
+    engine = AlertEngine()
+    for _ in range(5):
+        assert engine.evaluate("M1", 0.9, 0) is None
+    assert engine.state("M1") == OPTIMAL
+    assert engine.evaluate("M1", 0.9, 5) is not None
+
+
+def test_late_update_to_older_window_is_ignored():
+    engine = AlertEngine()
+    assert engine.evaluate("M1", 0.9, 5) is None
+    assert engine.evaluate("M1", 0.9, 0) is None
+    assert engine.state("M1") == OPTIMAL
+    # An older window can't reset the candidate either
+    assert engine.evaluate("M1", 0.1, 0) is None
+    assert engine.evaluate("M1", 0.9, 10)["to"] == CRITICAL
+
+
+def test_alert_ids_unique_when_reentering_a_level_within_a_window():
+    engine = AlertEngine(AlertConfig({"debounce": 1}))
+    ids = [engine.evaluate("M1", risk, 0)["alert_id"] for risk in (0.9, 0.5, 0.9)]
+    assert len(set(ids)) == 3
+
+
+def test_per_machine_overrides():
+    engine = AlertEngine(AlertConfig(machines={"M7": {"critical": 0.6, "debounce": 1}}))
+    [t] = feed(engine, "M7", [0.65])
+    assert t["to"] == CRITICAL
+    assert feed(engine, "M1", [0.65, 0.65])[-1]["to"] == WARNING
+    assert engine.config.for_machine("M7")["warning"] == alerts.DEFAULTS["warning"]
+
+
+def test_restore_recomputes_active_gauge():
+    engine = AlertEngine()
+    engine.restore({"M1": CRITICAL, "M2": WARNING, "M3": OPTIMAL, "M4": "BOGUS"})
+    assert alerts.ACTIVE._unlabeled.value == 2
+    assert engine.state("M1") == CRITICAL
+    assert engine.state("M4") == OPTIMAL
+    feed(engine, "M1", [0.1, 0.1])
+    assert alerts.ACTIVE._unlabeled.value == 1
+    engine.restore({"M1": WARNING})
+    assert alerts.ACTIVE._unlabeled.value == 2
+
+
+# ─── AlertNotifier ────────────────────────────────────────────────────────────
+
+def test_dedup_by_alert_id():
+    col = FakeCollection()
+    n = notifier(collection=col)
+    t = transition("M1", OPTIMAL, WARNING)
+    assert n.publish(t, now=0) is True
+    assert n.publish(dict(t), now=100) is False
+    assert list(col.docs) == [t["alert_id"]]
+
+
+def test_reentry_within_a_window_leaves_channel_on_engine_state():
+    engine = AlertEngine(AlertConfig({"debounce": 1}))
+    col = FakeCollection()
+    n = notifier(collection=col, machine_interval_s=60)
+    pushed = [n.publish(engine.evaluate("M1", risk, 0), now=i) for i, risk in enumerate((0.9, 0.5, 0.9))]
+    # CRITICAL sent, WARNING held back, CRITICAL again already shown
+    assert pushed == [True, False, False]
+    assert n.flush(now=100) == 0
+    assert n._pushed_state["M1"] == engine.state("M1") == CRITICAL
+    # Every transition is recorded, so latest_states() restores CRITICAL
+    assert [d["to"] for d in col.docs.values()] == [CRITICAL, WARNING, CRITICAL]
+
+
+def test_duplicate_clears_held_back_transition():
+    n = notifier(machine_interval_s=60)
+    sent = transition("M1", OPTIMAL, CRITICAL, 0)
+    assert n.publish(sent, now=0) is True
+    assert n.publish(transition("M1", CRITICAL, WARNING, 5), now=5) is False
+    assert n.publish(dict(sent), now=10) is False
+    assert n.flush(now=100) == 0
+
+
+def test_machine_interval_and_critical_bypass():
+    n = notifier(machine_interval_s=60)
+    assert n.publish(transition("M1", OPTIMAL, WARNING, 0), now=0) is True
+    assert n.publish(transition("M1", WARNING, CRITICAL, 5), now=5) is True
+    assert n.publish(transition("M2", OPTIMAL, WARNING, 5), now=5) is True
+    assert n.publish(transition("M2", WARNING, OPTIMAL, 10), now=10) is False
+
+
+def test_global_token_bucket_limits_critical():
+    n = notifier(max_per_sec=1, burst=2)
+    assert n.publish(transition("M1", OPTIMAL, CRITICAL), now=0) is True
+    assert n.publish(transition("M2", OPTIMAL, CRITICAL), now=0) is True
+    assert n.publish(transition("M3", OPTIMAL, CRITICAL), now=0) is False
+    assert n.publish(transition("M4", OPTIMAL, CRITICAL), now=1) is True
+
+
+def test_suppressed_recovery_is_sent_once_interval_ends():
+    col = FakeCollection()
+    n = notifier(collection=col, machine_interval_s=60)
+    assert n.publish(transition("M1", OPTIMAL, WARNING, 0), now=0) is True
+    recovery = transition("M1", WARNING, OPTIMAL, 30)
+    assert n.publish(recovery, now=30) is False
+    assert col.docs[recovery["alert_id"]]["notified"] is False
+
+    assert alerts.QUEUE_DEPTH.labels("pending").value == 1
+
+    assert n.flush(now=45) == 0
+    assert n.flush(now=61) == 1
+    assert alerts.QUEUE_DEPTH.labels("pending").value == 0
+    assert col.docs[recovery["alert_id"]]["notified"] is True
+    assert col.docs[recovery["alert_id"]]["pushed_at"]
+    assert n.flush(now=200) == 0
+
+
+def test_flush_racing_ahead_of_publish_write_keeps_record_notified():
+    recovery = transition("M1", WARNING, OPTIMAL, 30)
+
+    class RacingCollection(FakeCollection):
+        # flush() on another thread gets in between publish()'s lock and its write
+        def update_one(self, query, update, upsert=False):
+            if query["alert_id"] == recovery["alert_id"] and "$set" not in update:
+                n.flush(now=61)
+            super().update_one(query, update, upsert)
+
+    n = notifier(collection=RacingCollection(), machine_interval_s=60)
+    assert n.publish(transition("M1", OPTIMAL, WARNING, 0), now=0) is True
+    assert n.publish(recovery, now=30) is False
+    doc = n.collection.docs[recovery["alert_id"]]
+    assert (doc["notified"], doc["to"]) == (True, OPTIMAL)
+    assert doc["pushed_at"]
+
+
+def test_suppressed_flap_collapses_to_pushed_state():
+    n = notifier(machine_interval_s=60)
+    assert n.publish(transition("M1", OPTIMAL, WARNING, 0), now=0) is True
+    assert n.publish(transition("M1", WARNING, OPTIMAL, 10), now=10) is False
+    # Back on WARNING, which the push channel already shows: nothing left to send
+    assert n.publish(transition("M1", OPTIMAL, WARNING, 20), now=20) is False
+    assert n.flush(now=100) == 0
+
+
+def test_latest_suppressed_transition_wins():
+    col = FakeCollection()
+    n = notifier(collection=col, max_per_sec=0.01, burst=1)
+    assert n.publish(transition("M1", OPTIMAL, CRITICAL, 0), now=0) is True
+    assert n.publish(transition("M1", CRITICAL, WARNING, 5), now=5) is False
+    latest = transition("M1", WARNING, OPTIMAL, 10)
+    assert n.publish(latest, now=10) is False
+    assert n.flush(now=200) == 1
+    pushed = [a for a, d in col.docs.items() if d.get("notified")]
+    assert pushed == ["M1:0:CRITICAL", latest["alert_id"]]
@@ -0,0 +1,101 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telemetry
+from telemetry import Counter, Gauge, Histogram
+
+
+def lines(metric):
+    return telemetry._render_metric(metric.export()).splitlines()
+
+
+def test_counter_and_labels_render():
+    c = Counter("t_requests_total", "Requests", ["route"])
+    c.labels("/a").inc()
+    c.labels("/a").inc(2)
+    c.labels('say "hi"').inc()
+    assert lines(c) == [
+        "# HELP t_requests_total Requests",
+        "# TYPE t_requests_total counter",
+        't_requests_total{route="/a"} 3.0',
+        't_requests_total{route="say \\"hi\\""} 1.0',
+    ]
+
+
+def test_labels_arity_is_checked():
+    c = Counter("t_arity_total", "Arity", ["a", "b"])
+    try:
+        c.labels("x")
+    except ValueError:
+        return
+    raise AssertionError("expected ValueError")
+
+
+def test_histogram_bucket_boundaries_inf_and_count():
+    h = Histogram("t_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    # A value equal to an upper bound belongs to that bucket (le is inclusive)
+    for value in (0.05, 0.1, 0.5, 1.0, 7.0):
+        h.observe(value)
+    assert lines(h)[2:] == [
+        't_latency_seconds_bucket{le="0.1"} 2',
+        't_latency_seconds_bucket{le="1.0"} 4',
+        't_latency_seconds_bucket{le="+Inf"} 5',
+        "t_latency_seconds_sum 8.65",
+        "t_latency_seconds_count 5",
+    ]
+
+
+def test_histogram_timer_observes():
+    h = Histogram("t_timer_seconds", "Timer")
+    with h.time():
+        pass
+    assert lines(h)[-1] == "t_timer_seconds_count 1"
+
+
+def test_merge_sums_counters_and_histograms():
+    exported = []
+    for n in (1, 2):
+        c = Counter(f"t_merge_total_{n}", "Merge", ["route"])
+        c.labels("/a").inc(n)
+        c.labels(f"/only{n}").inc()
+        h = Histogram(f"t_merge_seconds_{n}", "Merge", buckets=(0.1, 1.0))
+        h.observe(0.05 * n)
+        exported.append([dict(c.export(), name="t_merge_total"), dict(h.export(), name="t_merge_seconds")])
+
+    merged = {m["name"]: m for m in telemetry.merge_snapshots({"100": exported[0], "200": exported[1]})}
+    counter = dict((tuple(k), v) for k, v in merged["t_merge_total"]["samples"])
+    assert counter == {("/a",): 3.0, ("/only1",): 1.0, ("/only2",): 1.0}
+    [(_, (counts, total))] = merged["t_merge_seconds"]["samples"]
+    assert counts == [2, 0, 0]
+    assert abs(total - 0.15) < 1e-9
+
+
+def test_merge_labels_gauges_by_pid():
+    snapshots = {}
+    for pid, value in (("100", 1), ("200", 5)):
+        g = Gauge(f"t_merge_gauge_{pid}", "Gauge")
+        g.set(value)
+        snapshots[pid] = [dict(g.export(), name="t_merge_gauge")]
+    [merged] = telemetry.merge_snapshots(snapshots)
+    assert telemetry._render_metric(merged).splitlines()[2:] == [
+        't_merge_gauge{pid="100"} 1',
+        't_merge_gauge{pid="200"} 5',
+    ]
+
+
+def test_multiprocess_render_reads_other_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(telemetry, "MULTIPROC_DIR", str(tmp_path))
+    c = Counter("t_mp_total", "Multiprocess")
+    c.inc(2)
+    other = [dict(c.export(), samples=[[[], 5.0]])]
+    (tmp_path / "1.json").write_text(json.dumps(other))
+    (tmp_path / "2.json").write_text("{not json")  # mid-replace; skipped
+
+    assert "t_mp_total 7.0" in telemetry.render().splitlines()
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+    telemetry.clear_multiprocess_dir()
+    assert list(tmp_path.iterdir()) == []